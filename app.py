@@ -1,15 +1,30 @@
 import streamlit as st
 import os
-import tempfile
 from src.document_processor import DocumentProcessor
 from src.embedding_manager import EmbeddingManager
-from src.summarizer_new import Summarizer  # Using the improved summarizer
-from src.utils import count_tokens, timeit
+from src.jobs import DONE, FAILED, JobQueue
+from src.metrics import metrics, start_metrics_server
+from src.pipeline import (BASIC_QUERY, DEPTH_CHUNKS, DETAILED_QUERY, document_outline, ingest_job,
+                          load_indexed_document, basic_summary_job, detailed_summary_job, page_summaries_job)
+from src.rag_pipeline import Summarizer
+from src.resources import registry
+from src.summary_cache import SummaryCache
 
-# Initialize components
-processor = DocumentProcessor(chunk_size=1000, chunk_overlap=200)
-embed_manager = EmbeddingManager()
-summarizer = Summarizer()
+# Initialize components once per process; Streamlit reruns and other sessions reuse them
+processor = registry.get("app.processor",
+                         lambda: DocumentProcessor(chunk_size=1000, chunk_overlap=200, structure_aware=True))
+embed_manager = registry.get("app.embed_manager", EmbeddingManager)
+summarizer = registry.get("app.summarizer", lambda: Summarizer(cache=SummaryCache()))
+# Extraction, indexing and summarization run here, off the script thread; sessions only submit and poll
+jobs = registry.get("app.jobs", lambda: JobQueue(max_workers=int(os.getenv("JOB_WORKERS", "2"))))
+
+# Serve /metrics (Prometheus) and /traces when METRICS_PORT is set
+if os.getenv("METRICS_PORT"):
+    registry.get("app.metrics_server", lambda: start_metrics_server(int(os.getenv("METRICS_PORT"))))
+
+# The basic and detailed queries never change, so encode them once per process
+# (section lookups go to the lexical index and need no embedding)
+embed_manager.precompute_queries([BASIC_QUERY, DETAILED_QUERY])
 
 st.title("📄 Document Summarization App")
 
@@ -23,81 +38,71 @@ Generate intelligent summaries from your documents using Retrieval-Augmented Gen
 uploaded_file = st.file_uploader("Drag and drop your paper (PDF, TXT, or Markdown)", type=["pdf", "txt", "md"])
 
 if uploaded_file is not None:
-    # Save the uploaded file to a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_file_path = tmp_file.name
-    
-    # Clear previous chunks before processing the new file
-    embed_manager.clear_documents()
-    
-    # Process the document
-    # Handle file based on type
+    # Each document gets its own namespace, keyed by a hash of its content
+    doc_id = embed_manager.document_id(uploaded_file.getvalue())
     file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-    
-    # For PDF files, use a different approach
-    if file_extension == '.pdf':
-        try:
-            import PyPDF2
-            with open(tmp_file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                content = ""
-                for page in pdf_reader.pages:
-                    content += page.extract_text() + "\n"
-        except ImportError:
-            st.error("PyPDF2 is not installed. Please install it with 'pip install PyPDF2'")
-            content = "Error: Cannot process PDF files without PyPDF2."
-    else:
-        # For text files, try different encodings
-        try:
-            with open(tmp_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            try:
-                with open(tmp_file_path, 'r', encoding='latin-1') as f:
-                    content = f.read()
-            except UnicodeDecodeError:
-                st.error("Unable to decode the file. Please check the file encoding.")
-                content = "Error: Cannot process this file due to encoding issues."
-    
-    chunks = processor.create_chunks(content)
-    st.write(f"Total chunks created: {len(chunks)}")
-
-    # Embed and store chunks
-    chunk_docs = []
-    for i, chunk in enumerate(chunks):
-        chunk_docs.append({
-            "chunk_id": f"chunk_{i}",
-            "text": chunk,
-            "metadata": {"source": "uploaded_document", "index": i}
-        })
-    embed_manager.add_documents(chunk_docs)
+    # Time handling the upload end to end, including waiting for its jobs
+    upload_trace = metrics.start_trace("upload", attributes={"doc_id": doc_id, "filename": uploaded_file.name},
+                                       file_type=file_extension)
+    try:
+        # Extract and index the document in a background job. Reruns and other sessions
+        # uploading the same file attach to the same job instead of starting over.
+        ingest_key = f"{doc_id}|{processor.chunk_size}|{processor.chunk_overlap}|{processor.structure_aware}"
+        if not embed_manager.has_document(doc_id) or not embed_manager.has_pages(doc_id):
+            # Evicted since it was indexed: a finished ingest job no longer holds
+            jobs.discard(JobQueue.job_id("ingest", ingest_key))
+        ingest_id = jobs.submit("ingest", ingest_key, ingest_job, uploaded_file.getvalue(), file_extension, doc_id,
+                                processor, embed_manager)
+        ingest_progress = st.progress(0.0, text="Processing document...")
+        ingest = jobs.wait(ingest_id, lambda job: ingest_progress.progress(job["progress"], text=job["message"]))
+        ingest_progress.empty()
+        if ingest["status"] == FAILED:
+            if "PyPDF2" in ingest["error"]:
+                st.error("PyPDF2 is not installed. Please install it with 'pip install PyPDF2'")
+            else:
+                st.error(f"Could not process the document: {ingest['error']}")
+            st.stop()
+        # The job result only refers to the document; its pages are kept with the index
+        document = load_indexed_document(embed_manager, doc_id)
+        if document is None:
+            st.error("The document was evicted from the index while it was being processed. Please upload it again.")
+            st.stop()
+        content = document.text
+        chunk_count = ingest["result"]["chunk_count"]
+        st.write(f"Total chunks created: {chunk_count}")
 
-    # Retrieve relevant chunks for summary
-    summary_query = "Summarize this document."
-    retrieved = embed_manager.search(summary_query, n_results=5)
-    context_chunks = [item['text'] for item in retrieved]
+        # Display document information
+        st.header("Document Information")
+        st.subheader("File Details")
+        st.write(f"**Filename:** {uploaded_file.name}")
+        st.write(f"**File Size:** {uploaded_file.size / 1024:.2f} KB")
+        st.write(f"**File Type:** {file_extension}")
     
-    # Generate summary
-    summary = summarizer.generate_summary(context_chunks, prompt=summary_query)
-
-    # Display document information
-    st.header("Document Information")
-    st.subheader("File Details")
-    st.write(f"**Filename:** {uploaded_file.name}")
-    st.write(f"**File Size:** {uploaded_file.size / 1024:.2f} KB")
-    st.write(f"**File Type:** {file_extension}")
-    
-    # Display document statistics
-    st.subheader("Document Statistics")
-    total_words = len(content.split())
-    st.write(f"**Total Words:** {total_words}")
-    st.write(f"**Total Chunks:** {len(chunks)}")
-    st.write(f"**Tokens Used for Summary:** {sum(count_tokens(chunk) for chunk in context_chunks)}")
+        # Display document statistics
+        st.subheader("Document Statistics")
+        total_words = len(content.split())
+        st.write(f"**Total Words:** {total_words}")
+        st.write(f"**Total Chunks:** {chunk_count}")
+        tokens_box = st.empty()
     
-    # Display summary in a prominent box
-    st.header("Document Summary")
-    st.info(summary)
+        # Display summary in a prominent box, filling it in as the summary job streams it
+        # (or at once when it is reused on reruns and for previously seen documents)
+        st.header("Document Summary")
+        summary_box = st.empty()
+        basic_id = jobs.submit("basic_summary", f"{doc_id}|{summarizer.version}", basic_summary_job,
+                               embed_manager, summarizer, doc_id)
+        basic = jobs.wait(basic_id, lambda job: summary_box.info(job["partial"]) if job["partial"]
+                          else summary_box.caption(f"{job['message']}..."))
+    finally:
+        # Also ends the trace when st.stop() or a rerun leaves the script early
+        upload_timings = metrics.end_trace(upload_trace)
+    if basic["status"] == FAILED:
+        summary_box.error(f"Could not generate the summary: {basic['error']}")
+        st.stop()
+    summary = basic["result"]["summary"]
+    context_chunks = basic["result"]["chunks"]
+    summary_box.info(summary)
+    tokens_box.write(f"**Tokens Used for Summary:** {basic['result']['tokens']}")
       # Show the top chunks used for generating the summary
     with st.expander("View Top Chunks Used for Summary"):
         for i, chunk in enumerate(context_chunks):
@@ -105,6 +110,17 @@ if uploaded_file is not None:
             st.text(chunk[:300] + "..." if len(chunk) > 300 else chunk)
             st.write("---")
     
+    # Show where the time went: the stages of the jobs behind this upload, as they
+    # ran (possibly for an earlier rerun or another session)
+    with st.expander(f"⏱️ Processing Timings ({upload_timings['seconds']:.2f}s)"):
+        st.table([{
+            "Job": job["kind"],
+            "Stage": span["name"],
+            "Started (s)": f"{span['offset']:.3f}",
+            "Took (s)": f"{span['seconds']:.3f}",
+            "Details": ", ".join(f"{key}={value}" for key, value in span["labels"].items())
+        } for job in (ingest, basic) if job["trace"] for span in job["trace"]["spans"]])
+    
     # Button for detailed summary
     st.header("📋 Detailed Summary")
     st.markdown("Generate a comprehensive analysis covering all key sections, methodologies, findings, and conclusions.")    
@@ -121,12 +137,7 @@ if uploaded_file is not None:
         )
     
     # Map depth selection to number of chunks
-    depth_to_chunks = {
-        "Standard": min(len(chunks), 20),
-        "Detailed": min(len(chunks), 35),
-        "Comprehensive": min(len(chunks), 50)
-    }
-    selected_chunk_count = depth_to_chunks[summary_depth]
+    selected_chunk_count = min(chunk_count, DEPTH_CHUNKS[summary_depth])
     
     if st.button("🚀 Generate Detailed Summary", type="primary"):
         try:
@@ -135,45 +146,18 @@ if uploaded_file is not None:
                 # Use many more chunks for a comprehensive detailed summary
                 # For detailed summary, use as many chunks as possible to cover the whole document
                 chunk_count = selected_chunk_count  # Use the chunk count based on selected summary depth
-                detailed_query = "Provide a comprehensive and detailed summary of this document covering all key sections, main points, methodologies, findings, and conclusions."
-                detailed_retrieved = embed_manager.search(detailed_query, n_results=chunk_count)
-                detailed_chunks = [item['text'] for item in detailed_retrieved]
-                
-                # Try to identify important sections for better coverage
-                # Common section headings in academic and technical documents
-                section_keywords = [
-                    "abstract", "introduction", "background", "literature review",
-                    "methodology", "methods", "experiment", "implementation",
-                    "results", "findings", "discussion", "analysis",
-                    "conclusion", "future work", "references"
-                ]
-                
-                # Search for chunks that might contain these important sections
-                section_chunks = []
-                for keyword in section_keywords:
-                    section_query = f"Find sections about {keyword}"
-                    section_results = embed_manager.search(section_query, n_results=2)
-                    section_chunks.extend([item['text'] for item in section_results])
                 
-                # Combine regular detailed chunks with section-specific chunks
-                # Remove duplicates while preserving order
-                all_chunks = []
-                seen = set()
-                for chunk in detailed_chunks + section_chunks:
-                    if chunk not in seen:
-                        all_chunks.append(chunk)
-                        seen.add(chunk)
-                
-                # Generate detailed summary using the enhanced chunk collection
-                detailed_summary = summarizer.generate_summary(all_chunks, prompt=detailed_query)
-                  # Display detailed summary
+                # Display detailed summary
                 st.subheader("📄 Detailed Document Summary")
                 st.markdown("---")
                 
                 # Use Streamlit's built-in styling for better readability
                 st.markdown("### 📝 Summary Content")
                 with st.container():
-                    st.markdown(
+                    detailed_box = st.empty()
+                
+                def show_detailed(detailed_summary):
+                    detailed_box.markdown(
                         f"""
                         <div style='
                             background-color: #ffffff; 
@@ -190,10 +174,22 @@ if uploaded_file is not None:
                         """, 
                         unsafe_allow_html=True
                     )
+                
+                # Detailed query matches plus section-specific chunks, packed into the depth's token budget
+                # and summarized in a background job, showing the summary as it streams in
+                detailed_id = jobs.submit("detailed_summary", f"{doc_id}|{summary_depth}|{chunk_count}|{summarizer.version}",
+                                          detailed_summary_job, embed_manager, summarizer, doc_id, chunk_count,
+                                          summary_depth)
+                detailed = jobs.wait(detailed_id, lambda job: show_detailed(job["partial"]) if job["partial"] else None)
+                if detailed["status"] == FAILED:
+                    raise RuntimeError(detailed["error"])
+                detailed_summary = detailed["result"]["summary"]
+                all_chunks = detailed["result"]["chunks"]
+                show_detailed(detailed_summary)
                 st.markdown("---")
                 
                 # Display token usage statistics
-                total_tokens_used = sum(count_tokens(chunk) for chunk in all_chunks)
+                total_tokens_used = detailed["result"]["tokens"]
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.metric("Chunks Used", len(all_chunks))
@@ -242,55 +238,43 @@ Tokens Used: {total_tokens_used}
                     with st.expander("📖 Page-by-Page Summary"):
                         st.write("Summaries of individual pages in the document:")
                         
-                        # Re-read the PDF to get page-specific content
+                        # Reuse the page text extracted at upload time
                         try:
-                            import PyPDF2
-                            with open(tmp_file_path, 'rb') as f:
-                                pdf_reader = PyPDF2.PdfReader(f)
-                                for page_num, page in enumerate(pdf_reader.pages):
-                                    page_text = page.extract_text()
-                                    if len(page_text.strip()) > 100:  # Only summarize non-empty pages
-                                        page_summary = summarizer.generate_summary([page_text], 
-                                                                                  prompt=f"Summarize page {page_num+1} of this document.")
-                                        st.markdown(f"**📄 Page {page_num+1}**")
+                            # Only non-empty pages are summarized, several at a time, in a background job
+                            pages_id = jobs.submit("page_summaries", f"{doc_id}|{summarizer.version}",
+                                                   page_summaries_job, summarizer, doc_id, document.pages,
+                                                   document.file_type)
+                            pages_box = st.empty()
+                            
+                            def show_pages(job):
+                                # Pages appear as soon as their summary is done
+                                with pages_box.container():
+                                    if job["status"] != DONE:
+                                        st.caption(f"Summarizing... {job['message']}")
+                                    for page_num, page_summary in job["partial"] or []:
+                                        st.markdown(f"**📄 Page {page_num}**")
                                         st.write(page_summary)
                                         st.write("---")
+                            
+                            page_job = jobs.wait(pages_id, show_pages)
+                            if page_job["status"] == FAILED:
+                                raise RuntimeError(page_job["error"])
+                            show_pages(dict(page_job, partial=page_job["result"]["pages"]))
                         except Exception as e:
                             st.error(f"Could not generate page-by-page summaries: {str(e)}")
                 
                 # Show sections breakdown
                 st.subheader("🔍 Document Structure Analysis")
                 
-                # Extract potential sections from the document
-                lines = content.split('\n')
-                potential_sections = []
-                section_content = {}
-                
-                for i, line in enumerate(lines):
-                    line = line.strip()
-                    # More comprehensive detection of section headings
-                    if (len(line) > 5 and len(line) < 100 and 
-                        (line.isupper() or 
-                         "section" in line.lower() or 
-                         "chapter" in line.lower() or
-                         any(keyword in line.lower() for keyword in ["abstract", "introduction", "background", 
-                                                                  "methodology", "methods", "results", 
-                                                                  "discussion", "conclusion", "references"]))):
-                        potential_sections.append(line)
-                        # Try to get a preview of the section content (next few lines)
-                        preview_lines = []
-                        for j in range(i+1, min(i+6, len(lines))):  # Get up to 5 lines of preview
-                            if lines[j].strip() and len(lines[j].strip()) > 10:  # Skip empty or very short lines
-                                preview_lines.append(lines[j].strip())
-                        if preview_lines:
-                            section_content[line] = " ".join(preview_lines)[:200] + "..."  # Limit preview length
+                # Sections were detected while chunking, read them back from the chunk metadata
+                sections = document_outline(embed_manager, doc_id, content)
                 
-                if potential_sections:
+                if sections:
                     st.write("**📋 Document Structure Analysis:**")
-                    for i, section in enumerate(potential_sections[:15]):  # Show up to 15 sections
-                        st.markdown(f"**{i+1}. {section}**")
-                        if section in section_content:
-                            st.markdown(f"*Preview:* {section_content[section]}")
+                    for i, section in enumerate(sections):  # Up to 15 sections
+                        st.markdown(f"**{i+1}. {section['heading']}**")
+                        if section['preview']:
+                            st.markdown(f"*Preview:* {section['preview']}")
                         st.write("---")
                 else:
                     st.write("No clear section structure detected in this document.")
@@ -306,8 +290,6 @@ Tokens Used: {total_tokens_used}
         except Exception as e:
             st.error(f"An error occurred while generating the detailed summary: {str(e)}")
             st.info("Try processing a smaller document or reducing the chunk size in the settings.")
-      # Clean up temporary file
-    os.unlink(tmp_file_path)
 
     # Add a button to save the basic summary
     if st.button("💾 Save Basic Summary"):
@@ -0,0 +1,82 @@
+"""
+Measure LLM client latency and throughput against the local mock server,
+with a pooled session versus a new connection per request.
+
+Usage:
+    python benchmarks/bench_llm_client.py [--requests 200] [--concurrency 8] [--latency 0.05]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.llm_client import GeminiClient
+from src.mock_llm_server import start_mock_server
+
+PROMPT = "Summarize this document.\n\n" + " ".join(["retrieval augmented generation"] * 200)
+
+
+class UnpooledClient(GeminiClient):
+    """Opens a fresh connection for every call, like calling requests.post directly."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # requests.post sets up and tears down a session per call
+        self.session = requests
+
+
+def run(client, requests_count: int, concurrency: int):
+    def call(_):
+        start = time.perf_counter()
+        client.generate(PROMPT)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(call, range(requests_count)))
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput": requests_count / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1]
+    }
+
+
+def time_to_first_piece(client):
+    start = time.perf_counter()
+    first = None
+    for _ in client.stream(PROMPT):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, token_latency=0.002)
+    options = dict(api_key="mock", base_url=server.base_url, requests_per_minute=0,
+                   pool_size=args.concurrency)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, server latency {args.latency * 1000:.0f} ms")
+    print(f"{'client':>10} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for name, client in [("pooled", GeminiClient(**options)), ("unpooled", UnpooledClient(**options))]:
+        result = run(client, args.requests, args.concurrency)
+        print(f"{name:>10} {result['throughput']:>8.1f} {result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f}")
+
+    first, total = time_to_first_piece(GeminiClient(**options))
+    print(f"streaming: first piece after {first * 1000:.1f} ms, complete after {total * 1000:.1f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
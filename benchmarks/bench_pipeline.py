@@ -0,0 +1,267 @@
+"""
+Benchmark the ingest-and-summarize pipeline on synthetic documents of growing size.
+
+Measures wall time, throughput and peak Python memory (tracemalloc) of each
+component: chunking (create_chunks, process_documents), embedding
+(create_embeddings, add_documents), dense, lexical and hybrid search, and
+generate_summary at every depth. Results are written as JSON and can be
+compared against a stored baseline.
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 1 10 100 1000 --output results.json
+    python benchmarks/bench_pipeline.py --encoder hash --baseline benchmarks/baseline.json --tolerance 0.2
+    python benchmarks/bench_pipeline.py --encoder hash --save-baseline benchmarks/baseline.json
+
+--encoder hash swaps the SentenceTransformer for deterministic hash vectors,
+which isolates the pipeline's own overhead from model inference. The committed
+benchmarks/baseline.json was produced that way; its meta records the commit
+and machine it was measured on.
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Keep progress bars out of the measurements and the report
+os.environ.setdefault("TQDM_DISABLE", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.document_processor import DocumentProcessor
+from src.embedding_manager import EmbeddingManager
+from src.pipeline import BASIC_CHUNKS, BASIC_QUERY, DEPTH_CHUNKS, DETAILED_QUERY, SECTION_KEYWORDS
+from src.rag_pipeline import Summarizer
+from src.resources import registry
+
+WORDS_PER_PAGE = 500
+WORDS = ("the model results show a significant improvement over the baseline and we conclude that "
+         "retrieval with vector embeddings helps large language models on data analysis tasks "
+         "training evaluation dataset method approach network layer attention context").split()
+HEADINGS = ["Abstract", "1. Introduction", "2. Background", "3. Methodology", "4. Results",
+            "5. Discussion", "6. Conclusion", "References"]
+QUERIES = [BASIC_QUERY, DETAILED_QUERY, "Find sections about methodology", "Find sections about results"]
+
+
+def make_pages(pages: int, seed: int = 0):
+    """Generate the pages of a synthetic paper, roughly WORDS_PER_PAGE words each, with section headings."""
+    rng = random.Random(seed)
+    result = []
+    for page in range(pages):
+        lines = []
+        heading = page * len(HEADINGS) // pages
+        if page == 0 or heading != (page - 1) * len(HEADINGS) // pages:
+            lines.append(HEADINGS[heading])
+        for _ in range(WORDS_PER_PAGE // 20):
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(20)) + ".")
+        result.append("\n".join(lines))
+    return result
+
+
+class HashEncoder:
+    """Stand-in for SentenceTransformer producing deterministic pseudo-random vectors."""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], "little")
+            vectors[row] = np.random.default_rng(seed).standard_normal(self.dimension)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def measure(func, repeat: int, setup=None):
+    """
+    Run func repeat times, calling setup (untimed) before each run.
+
+    Returns (best seconds, peak traced MB of one more run, result of the last timed run).
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak / (1 << 20), result
+
+
+def run(sizes, repeat: int, encoder: str, model_name: str):
+    if encoder == "hash":
+        registry.get(("sentence_transformer", model_name, None), HashEncoder)
+
+    processor = DocumentProcessor(chunk_size=1000, chunk_overlap=200)
+    summarizer = Summarizer(backend="heuristic")
+    results = []
+
+    def record(name, pages, seconds, peak_mb, units, unit):
+        results.append({
+            "name": name,
+            "pages": pages,
+            "seconds": seconds,
+            "throughput": units / seconds if seconds else 0.0,
+            "unit": f"{unit}/s",
+            "peak_mb": peak_mb
+        })
+        print(f"{name:<32} {pages:>6} pages {seconds * 1000:>10.1f} ms {units / seconds if seconds else 0:>12.1f} {unit}/s "
+              f"{peak_mb:>8.1f} MB")
+
+    for pages in sizes:
+        page_texts = make_pages(pages)
+        text = "\n".join(page_texts)
+
+        seconds, peak, chunks = measure(lambda: processor.create_chunks(text), repeat)
+        record("create_chunks", pages, seconds, peak, pages, "pages")
+
+        # One record per page, like a corpus of short abstracts
+        records = [{"id": f"doc{i}", "title": f"Document {i}", "abstract": page_text}
+                   for i, page_text in enumerate(page_texts)]
+        seconds, peak, _ = measure(lambda: processor.process_documents(records), repeat)
+        record("process_documents", pages, seconds, peak, pages, "pages")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = EmbeddingManager(model_name=model_name, persist_directory=None,
+                                       cache_path=os.path.join(tmp, "embeddings.sqlite3"))
+            # Load the model before timing anything
+            manager.create_embeddings(["warm up"])
+
+            # Start every run from an empty cache, so each one really encodes
+            seconds, peak, _ = measure(lambda: manager.create_embeddings(chunks), repeat,
+                                       setup=manager.cache.clear)
+            record("create_embeddings", pages, seconds, peak, len(chunks), "chunks")
+
+            chunk_docs = [{"chunk_id": f"chunk_{i}", "text": chunk, "metadata": {"index": i}}
+                          for i, chunk in enumerate(chunks)]
+
+            def add_documents():
+                doc_id = f"bench{time.perf_counter_ns()}"
+                manager.add_document(doc_id, [dict(doc, chunk_id=f"{doc_id}_{i}") for i, doc in enumerate(chunk_docs)])
+                return doc_id
+            seconds, peak, doc_id = measure(add_documents, repeat)
+            record("add_documents (cached)", pages, seconds, peak, len(chunks), "chunks")
+
+            manager.precompute_queries(QUERIES)
+            seconds, peak, _ = measure(lambda: [manager.search(query, n_results=5, doc_id=doc_id)
+                                                for query in QUERIES], repeat)
+            record("search", pages, seconds, peak, len(QUERIES), "queries")
+
+            seconds, peak, _ = measure(lambda: manager.lexical_search_many(SECTION_KEYWORDS, n_results=2,
+                                                                           doc_id=doc_id), repeat)
+            record("lexical_search", pages, seconds, peak, len(SECTION_KEYWORDS), "queries")
+
+            seconds, peak, _ = measure(lambda: [manager.hybrid_search(query, n_results=5, doc_id=doc_id)
+                                                for query in QUERIES], repeat)
+            record("hybrid_search", pages, seconds, peak, len(QUERIES), "queries")
+
+            depths = [("basic", BASIC_QUERY, BASIC_CHUNKS)] + [
+                (depth.lower(), DETAILED_QUERY, count) for depth, count in DEPTH_CHUNKS.items()]
+            for depth, query, count in depths:
+                context = [item['text'] for item in manager.search(query, n_results=count, doc_id=doc_id)]
+                seconds, peak, _ = measure(lambda: summarizer.generate_summary(context, prompt=query), repeat)
+                record(f"generate_summary ({depth})", pages, seconds, peak, len(context), "chunks")
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline, tolerance: float, min_delta: float) -> int:
+    """
+    Print the change against the baseline. Returns the number of regressions: runs
+    slower by more than tolerance and by more than min_delta seconds, which keeps
+    timer noise on sub-millisecond benchmarks from failing the comparison.
+    """
+    previous = {(entry["name"], entry["pages"]): entry for entry in baseline["results"]}
+    regressions = 0
+    print(f"\n{'benchmark':<32} {'pages':>6} {'baseline ms':>12} {'now ms':>10} {'change':>8}")
+    for entry in results:
+        old = previous.get((entry["name"], entry["pages"]))
+        if old is None:
+            continue
+        change = entry["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        flag = ""
+        if change > tolerance and entry["seconds"] - old["seconds"] > min_delta:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{entry['name']:<32} {entry['pages']:>6} {old['seconds'] * 1000:>12.1f} "
+              f"{entry['seconds'] * 1000:>10.1f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000], help="Document sizes in pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is kept")
+    parser.add_argument("--encoder", choices=["model", "hash"], default="model")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    parser.add_argument("--save-baseline", default=None, help="Write results to this JSON file as the new baseline")
+    parser.add_argument("--baseline", default=None, help="Compare results with this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown against the baseline before failing (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.encoder, args.model)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "encoder": args.encoder,
+            "model": args.model,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("encoder") != args.encoder:
+            print(f"Warning: baseline used the '{baseline['meta'].get('encoder')}' encoder")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"\n{regressions} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the chunk scanner used by Summarizer against the
+per-keyword rescanning it replaced, for growing numbers of chunks.
+
+Usage:
+    python benchmarks/bench_text_scanner.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.text_scanner import scan_chunks, SECTION_HEADERS, FINDING_INDICATORS
+
+WORDS = ("the model results show a significant improvement over the baseline and we conclude that "
+         "retrieval with vector embeddings helps large language models on data analysis tasks").split()
+HEADINGS = ["Abstract", "1. Introduction", "2. Background", "3. Methodology", "4. Results",
+            "5. Discussion", "6. Conclusion", "References"]
+
+
+def make_chunks(count: int, words_per_chunk: int = 750, seed: int = 0):
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        lines = []
+        for _ in range(words_per_chunk // 15):
+            if rng.random() < 0.02:
+                lines.append(rng.choice(HEADINGS))
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(15)) + ".")
+        chunks.append("\n".join(lines))
+    return chunks
+
+
+def rescan_reference(chunks):
+    """The scanning the summarizer did before: one lower() and one scan per check."""
+    combined_text = " ".join(chunks)
+    for term in ["retrieval", "embedding", "vector", "language model", "neural", "network",
+                 "machine learning", "data", "analysis", "algorithm", "research", "abstract",
+                 "references", "executive summary", "chapter"]:
+        term in combined_text.lower()
+    "LLM" in combined_text.upper()
+    "ML" in combined_text.upper()
+    sections = {}
+    for header in SECTION_HEADERS:
+        for chunk in chunks:
+            lines = chunk.split('\n')
+            for i, line in enumerate(lines):
+                if header in line.lower() and len(line) < 50 and header not in sections:
+                    sections[header] = "\n".join(lines[i + 1:i + 6])[:300]
+    findings = []
+    for indicator in FINDING_INDICATORS:
+        for chunk in chunks:
+            if indicator in chunk.lower():
+                for sentence in chunk.split('.'):
+                    if indicator in sentence.lower():
+                        findings.append(sentence.strip())
+    return sections, findings[:5]
+
+
+def best_of(func, chunks, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(chunks)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"{'chunks':>8} {'rescan (ms)':>12} {'single pass (ms)':>17} {'speedup':>8}")
+    for count in [10, 20, 50, 100, 200, 500]:
+        chunks = make_chunks(count)
+        reference = best_of(rescan_reference, chunks)
+        scanner = best_of(scan_chunks, chunks)
+        print(f"{count:>8} {reference * 1000:>12.1f} {scanner * 1000:>17.1f} {reference / scanner:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
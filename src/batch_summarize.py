@@ -0,0 +1,280 @@
+"""
+Headless batch summarization of a directory or manifest of PDF, TXT and Markdown files.
+
+Runs the same pipeline as the Streamlit app (load, index, retrieve, summarize)
+across a pool of worker threads and writes one Markdown summary per file.
+Finished files are recorded in a checkpoint, so an interrupted run picks up
+where it stopped when started again with the same output directory. Set
+METRICS_TRACE_DIR to also dump a per-file trace of every stage.
+
+Usage:
+    python -m src.batch_summarize reports/ --output batch_summaries --workers 4
+    python -m src.batch_summarize manifest.txt --output batch_summaries --detailed --depth Detailed --pages
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
+from tqdm import tqdm
+from src.document_loader import load_document
+from src.document_processor import DocumentProcessor
+from src.embedding_manager import EmbeddingManager
+from src.metrics import metrics, start_metrics_server
+from src.pipeline import (DEPTH_CHUNKS, DEPTH_TOKEN_BUDGETS, index_document, retrieve_basic, retrieve_detailed,
+                          iter_basic_summary, iter_detailed_summary, iter_page_summaries)
+from src.rag_pipeline import Summarizer
+from src.summary_cache import SummaryCache
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+STAGES = ("load", "index", "retrieve", "summarize", "write")
+CHECKPOINT_FILE = "checkpoint.jsonl"
+REPORT_FILE = "run_report.json"
+METRICS_FILE = "metrics.prom"
+
+
+def find_inputs(source: str) -> List[str]:
+    """
+    List the files to summarize.
+
+    source is either a directory, searched recursively for supported files, or a
+    manifest: a JSON list of paths or a text file with one path per line. Relative
+    manifest paths are resolved against the manifest's directory.
+    """
+    if os.path.isdir(source):
+        paths = []
+        for directory, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    paths.append(os.path.join(directory, name))
+        return sorted(paths)
+
+    with open(source, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if source.lower().endswith(".json"):
+        entries = json.loads(content)
+    else:
+        entries = [line.strip() for line in content.splitlines()
+                   if line.strip() and not line.strip().startswith("#")]
+    base = os.path.dirname(os.path.abspath(source))
+    return [entry if os.path.isabs(entry) else os.path.join(base, entry) for entry in entries]
+
+
+class Checkpoint:
+    """Append-only JSON Lines record of finished files, keyed by path, content hash and options."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._done = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A run killed mid-write can leave a truncated last line
+                        continue
+                    if entry.get("status") == "done":
+                        self._done[entry["key"]] = entry
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def make_key(path: str, doc_id: str, options: str) -> str:
+        return f"{os.path.abspath(path)}|{doc_id}|{options}"
+
+    def is_done(self, key: str) -> bool:
+        entry = self._done.get(key)
+        return entry is not None and os.path.exists(entry["output"])
+
+    def record(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            if entry.get("status") == "done":
+                self._done[entry["key"]] = entry
+
+    def close(self):
+        self._file.close()
+
+
+def output_path_for(path: str, root: Optional[str], output_dir: str) -> str:
+    """Map an input file to its summary file, keeping files with the same name apart."""
+    relative = os.path.relpath(path, root) if root else os.path.basename(path)
+    stem = os.path.splitext(relative)[0].replace(os.sep, "__").replace("..", "_")
+    return os.path.join(output_dir, f"{stem}_summary.md")
+
+
+def summarize_file(path: str, output_path: str, processor: DocumentProcessor,
+                   embed_manager: EmbeddingManager, summarizer: Summarizer,
+                   detailed: bool = False, depth: str = "Comprehensive", pages: bool = False,
+                   page_workers: Optional[int] = 1, doc_id: Optional[str] = None) -> Dict[str, float]:
+    """Summarize one file into output_path. Returns the seconds spent in each stage."""
+    timings = {}
+    start = time.perf_counter()
+    if doc_id is None:
+        with open(path, 'rb') as f:
+            doc_id = embed_manager.document_id(f.read())
+    document = load_document(path, max_workers=page_workers)
+    timings["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunk_count = index_document(document, doc_id, processor, embed_manager)
+    timings["index"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    basic_retrieved = retrieve_basic(embed_manager, doc_id)
+    detailed_retrieved = None
+    if detailed:
+        detailed_retrieved = retrieve_detailed(embed_manager, doc_id, min(chunk_count, DEPTH_CHUNKS[depth]),
+                                               token_budget=DEPTH_TOKEN_BUDGETS[depth])
+    timings["retrieve"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    name = os.path.basename(path)
+    sections = [f"# Summary of {name}", "",
+                f"Words: {len(document.text.split())} | Chunks: {chunk_count}", "",
+                "## Basic Summary", "",
+                "".join(iter_basic_summary(summarizer, doc_id, basic_retrieved)).strip(), ""]
+    if detailed:
+        sections += [f"## Detailed Summary ({depth})", "",
+                     "".join(iter_detailed_summary(summarizer, doc_id, detailed_retrieved, depth)).strip(), ""]
+    if pages and document.file_type == '.pdf':
+        page_nums, page_summaries = iter_page_summaries(summarizer, doc_id, document)
+        ordered = [None] * len(page_nums)
+        for i, page_summary in page_summaries:
+            ordered[i] = page_summary
+        sections += ["## Page Summaries", ""]
+        for page_num, page_summary in zip(page_nums, ordered):
+            sections += [f"### Page {page_num}", "", page_summary, ""]
+    timings["summarize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # Write to a temporary file first, so an interrupted write never looks finished
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(sections))
+    os.replace(tmp_path, output_path)
+    timings["write"] = time.perf_counter() - start
+    return timings
+
+
+def run_batch(paths: List[str], output_dir: str, processor: DocumentProcessor,
+              embed_manager: EmbeddingManager, summarizer: Summarizer, workers: int = 4,
+              detailed: bool = False, depth: str = "Comprehensive", pages: bool = False,
+              page_workers: Optional[int] = 1, root: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Summarize files concurrently, skipping those the checkpoint in output_dir records as done.
+
+    Returns a report with file counts, files per second and per-stage timings,
+    which is also written to output_dir/run_report.json.
+    """
+    if depth not in DEPTH_CHUNKS:
+        raise ValueError(f"Unknown summary depth '{depth}', expected one of {list(DEPTH_CHUNKS)}")
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(output_dir, CHECKPOINT_FILE))
+    options = f"detailed={detailed}:{depth}|pages={pages}|{summarizer.version}"
+    stage_totals = {stage: 0.0 for stage in STAGES}
+    counts = {"total": len(paths), "done": 0, "skipped": 0, "failed": 0}
+    failures = []
+
+    def process(path: str) -> Optional[Dict[str, float]]:
+        with open(path, 'rb') as f:
+            doc_id = embed_manager.document_id(f.read())
+        key = checkpoint.make_key(path, doc_id, options)
+        if checkpoint.is_done(key):
+            return None
+        output_path = output_path_for(path, root, output_dir)
+        with metrics.trace("batch_file", attributes={"path": path, "doc_id": doc_id}):
+            timings = summarize_file(path, output_path, processor, embed_manager, summarizer,
+                                     detailed=detailed, depth=depth, pages=pages,
+                                     page_workers=page_workers, doc_id=doc_id)
+        checkpoint.record({"key": key, "path": path, "doc_id": doc_id, "output": output_path,
+                           "status": "done", "timings": timings, "finished_at": time.time()})
+        return timings
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(process, path): path for path in paths}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Summarizing", unit="file"):
+                path = futures[future]
+                try:
+                    timings = future.result()
+                except Exception as e:
+                    counts["failed"] += 1
+                    failures.append({"path": path, "error": f"{type(e).__name__}: {e}"})
+                    checkpoint.record({"path": path, "status": "failed", "error": str(e),
+                                       "finished_at": time.time()})
+                    continue
+                if timings is None:
+                    counts["skipped"] += 1
+                    continue
+                counts["done"] += 1
+                for stage, seconds in timings.items():
+                    stage_totals[stage] += seconds
+    finally:
+        checkpoint.close()
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "files": counts,
+        "seconds": elapsed,
+        "files_per_second": counts["done"] / elapsed if elapsed else 0.0,
+        "workers": workers,
+        "stage_seconds": stage_totals,
+        "stage_mean_seconds": {stage: total / counts["done"] if counts["done"] else 0.0
+                               for stage, total in stage_totals.items()},
+        "failures": failures
+    }
+    with open(os.path.join(output_dir, REPORT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(output_dir, METRICS_FILE), 'w', encoding='utf-8') as f:
+        f.write(metrics.to_prometheus())
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a directory or manifest of documents without the web UI.")
+    parser.add_argument("source", help="Directory of PDF/TXT/MD files, or a manifest (JSON list or one path per line)")
+    parser.add_argument("--output", default="batch_summaries", help="Directory for summaries, checkpoint and report")
+    parser.add_argument("--workers", type=int, default=4, help="Files summarized concurrently")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="Processes extracting the pages of one PDF (default: 1, files already run in parallel)")
+    parser.add_argument("--detailed", action="store_true", help="Also write the detailed summary")
+    parser.add_argument("--depth", default="Comprehensive", choices=list(DEPTH_CHUNKS))
+    parser.add_argument("--pages", action="store_true", help="Also write page-by-page summaries for PDFs")
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--no-summary-cache", action="store_true", help="Regenerate summaries even if cached")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve /metrics and /traces while running")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    paths = find_inputs(args.source)
+    root = args.source if os.path.isdir(args.source) else None
+    processor = DocumentProcessor(chunk_size=1000, chunk_overlap=200, structure_aware=True)
+    embed_manager = EmbeddingManager(persist_directory=args.persist_directory)
+    summarizer = Summarizer(cache=None if args.no_summary_cache else SummaryCache())
+
+    report = run_batch(paths, args.output, processor, embed_manager, summarizer, workers=args.workers,
+                       detailed=args.detailed, depth=args.depth, pages=args.pages,
+                       page_workers=args.page_workers, root=root)
+
+    files = report["files"]
+    print(f"Summarized {files['done']} files ({files['skipped']} already done, {files['failed']} failed) "
+          f"in {report['seconds']:.1f}s, {report['files_per_second']:.2f} files/s")
+    for stage in STAGES:
+        print(f"  {stage:<10} total {report['stage_seconds'][stage]:8.2f}s   "
+              f"mean {report['stage_mean_seconds'][stage]:7.3f}s")
+    for failure in report["failures"]:
+        print(f"  failed: {failure['path']}: {failure['error']}")
+    sys.exit(1 if files["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
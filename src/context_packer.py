@@ -0,0 +1,103 @@
+"""
+Token-budgeted context packing between retrieval and summarization.
+
+Retrieved chunks overlap (neighbouring windows share chunk_overlap tokens) and
+several queries often return the same passage, so sending every hit wastes
+tokens on repeated text. pack_context() picks chunks by maximal marginal
+relevance over their stored embeddings until the token budget is spent, and
+hands them to the summarizer in document order.
+"""
+from typing import List, Dict, Any, Optional
+import numpy as np
+from src.metrics import metrics
+from src.utils import count_tokens
+
+
+def token_count(item: Dict[str, Any]) -> int:
+    """
+    Token count of a search result, as recorded at chunking time. Chunks indexed
+    before counts were stored are counted on the spot.
+    """
+    count = (item.get('metadata') or {}).get('token_count')
+    if count is None:
+        metrics.inc("token_recounts")
+        return count_tokens(item['text'])
+    return count
+
+
+def document_position(item: Dict[str, Any]):
+    """Sort key placing a chunk where it occurs in its document."""
+    metadata = item.get('metadata') or {}
+    index = metadata.get('index', metadata.get('chunk_index'))
+    return (str(metadata.get('doc_id', metadata.get('paper_id', ''))),
+            index if index is not None else float('inf'))
+
+
+def pack_context(items: List[Dict[str, Any]], token_budget: Optional[int],
+                 lambda_mult: float = 0.7, duplicate_threshold: float = 0.95,
+                 query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """
+    Select search results to fill a token budget, most useful first, and return them in document order.
+
+    Args:
+        items: Search results, best match first. Each should carry its 'embedding'
+            (search(..., include_embeddings=True)) and its cosine 'distance'.
+        token_budget: Maximum total tokens of the selected chunks, or None for no limit.
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0).
+        duplicate_threshold: Chunks at least this similar to an already selected
+            chunk are dropped as near-duplicates.
+        query_embedding: Embedding of the query the items were retrieved for. When
+            given, every item's relevance is its cosine similarity to it, so results
+            from different lookups (dense hits, section chunks, keyword matches)
+            compete on one scale. Without it relevance is 1 - distance, falling
+            back to rank order for items without a distance.
+
+    Returns:
+        The selected items, sorted by their position in the document.
+    """
+    if not items:
+        return []
+    with metrics.span("pack"):
+        tokens = np.array([token_count(item) for item in items])
+        # Results without a distance keep their rank order as relevance
+        relevance = np.array([1.0 - item['distance'] if item.get('distance') is not None
+                              else 1.0 - rank / len(items) for rank, item in enumerate(items)])
+
+        if all(item.get('embedding') is not None for item in items):
+            vectors = np.stack([np.asarray(item['embedding'], dtype=np.float32) for item in items])
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            similarity = vectors @ vectors.T
+            if query_embedding is not None:
+                query = np.asarray(query_embedding, dtype=np.float32)
+                relevance = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        else:
+            # Without embeddings only exact repeats are known to be redundant
+            texts = [item['text'] for item in items]
+            similarity = np.array([[float(a == b) for b in texts] for a in texts])
+
+        budget = np.inf if token_budget is None else token_budget
+        remaining = np.ones(len(items), dtype=bool)
+        # Highest similarity of every candidate to the chunks selected so far
+        redundancy = np.zeros(len(items))
+        selected = []
+        duplicates = 0
+        while True:
+            candidates = remaining & (tokens <= budget)
+            if not candidates.any():
+                break
+            scores = np.where(candidates, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+            best = int(np.argmax(scores))
+            remaining[best] = False
+            if redundancy[best] >= duplicate_threshold:
+                duplicates += 1
+                continue
+            selected.append(best)
+            budget -= tokens[best]
+            redundancy = np.maximum(redundancy, similarity[best])
+
+    packed = sorted((items[i] for i in selected), key=document_position)
+    metrics.inc("context_chunks_packed", len(packed))
+    metrics.inc("context_chunks_dropped", len(items) - len(packed))
+    metrics.inc("context_duplicates_dropped", duplicates)
+    metrics.inc("context_tokens_packed", int(tokens[selected].sum()) if selected else 0)
+    return packed
@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterator, Tuple, Optional
+from src.metrics import metrics
+
+# Below this many pages the process pool costs more than it saves
+PARALLEL_PAGE_THRESHOLD = 16
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract the text of pages [start, end) of a PDF. Runs in a worker process."""
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        return [(page_num + 1, reader.pages[page_num].extract_text() or "")
+                for page_num in range(start, end)]
+
+
+def count_pdf_pages(file_path: str) -> int:
+    """Get the number of pages in a PDF."""
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def iter_pdf_pages(file_path: str, max_workers: Optional[int] = None,
+                   pages_per_task: int = 8) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for every page of a PDF, in page order.
+
+    Page numbers start at 1. Large documents are split into page ranges that are
+    extracted in parallel by a process pool; pages are yielded as soon as their
+    range (and every range before it) is done.
+    """
+    page_count = count_pdf_pages(file_path)
+    if page_count < PARALLEL_PAGE_THRESHOLD or max_workers == 1:
+        yield from _extract_page_range(file_path, 0, page_count)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_extract_page_range, file_path, start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+        for future in futures:
+            yield from future.result()
+
+
+def read_text_file(file_path: str) -> str:
+    """Read a text file, falling back to latin-1 if it is not valid UTF-8."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        with open(file_path, 'r', encoding='latin-1') as f:
+            return f.read()
+
+
+class LoadedDocument:
+    """
+    The extracted text of a document, kept per page.
+
+    Text and Markdown files are treated as a single page.
+    """
+
+    def __init__(self, pages: List[str], file_type: str):
+        self.pages = pages
+        self.file_type = file_type
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        """The full text, with every page of a PDF followed by a newline."""
+        if self._text is None:
+            self._text = "".join(self.iter_text())
+        return self._text
+
+    def iter_text(self) -> Iterator[str]:
+        """Yield the full text piece by piece, without building it in memory."""
+        if self.file_type == '.pdf':
+            for page in self.pages:
+                yield page + "\n"
+        else:
+            yield from self.pages
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def iter_pages(self) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) pairs, starting at page 1."""
+        for page_num, page_text in enumerate(self.pages):
+            yield page_num + 1, page_text
+
+
+def load_document(file_path: str, max_workers: Optional[int] = None) -> LoadedDocument:
+    """Load a PDF, TXT or Markdown file into a LoadedDocument."""
+    file_type = os.path.splitext(file_path)[1].lower()
+    with metrics.span("extract", file_type=file_type):
+        if file_type == '.pdf':
+            pages = [text for _, text in iter_pdf_pages(file_path, max_workers=max_workers)]
+        else:
+            pages = [read_text_file(file_path)]
+    metrics.inc("pages_extracted", len(pages), file_type=file_type)
+    return LoadedDocument(pages, file_type)
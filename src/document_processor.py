@@ -1,61 +1,313 @@
 import json
-from typing import List, Dict, Any
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from tqdm import tqdm
-import tiktoken
+from src.resources import get_tokenizer
+from src.structure import iter_sections
+
+# Text pieces longer than this are tokenized in slices, so memory follows the chunk window
+MAX_PIECE_CHARS = 65536
+# Read size used when streaming a JSON array
+JSON_READ_SIZE = 1 << 20
+# Chunk fields stored as vector store metadata, so token counts never have to be recomputed
+OFFSET_FIELDS = ('token_count', 'token_start', 'token_end', 'char_start', 'char_end')
+# Section fields added by structure-aware chunking
+SECTION_FIELDS = ('section', 'section_type', 'page')
+
+# Per-process DocumentProcessor used by the ingestion pool workers
+_worker_processor = None
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int):
+    global _worker_processor
+    _worker_processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _process_batch(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    chunks = []
+    for document in documents:
+        chunks.extend(_worker_processor.process_document(document))
+    return chunks
+
+
+def _iter_json_array(f) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        more = f.read(JSON_READ_SIZE)
+        buffer = buffer[pos:] + more
+        pos = 0
+        eof = not more
+
+    # Find the opening bracket, however many reads of leading whitespace come first
+    while '[' not in buffer:
+        if eof:
+            raise ValueError("Expected a JSON array")
+        pos = len(buffer)
+        read_more()
+    pos = buffer.index('[') + 1
+    while True:
+        # Skip separators, reading more input when the buffer runs out
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unterminated JSON array")
+            read_more()
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            read_more()
+            continue
+        if end == len(buffer) and not eof:
+            # A value ending with the buffer may continue in the next read (e.g. a split number)
+            read_more()
+            continue
+        yield item
+        pos = end
+        if pos > JSON_READ_SIZE:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def split_text(text: str, max_chars: int = MAX_PIECE_CHARS) -> Iterator[str]:
+    """Split text into pieces of at most max_chars, preferring whitespace boundaries."""
+    start = 0
+    while len(text) - start > max_chars:
+        end = start + max_chars
+        # Cut before a space, since tokens usually carry their leading space
+        boundary = text.rfind(' ', start + max_chars // 2, end)
+        if boundary != -1:
+            end = boundary
+        yield text[start:end]
+        start = end
+    if start < len(text):
+        yield text[start:]
+
 
 class DocumentProcessor:
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Splits text into overlapping token windows.
+
+    With structure_aware, iter_document_chunks first splits a document into
+    sections at detected headings and windows each section separately, so no chunk
+    straddles two sections and every chunk knows its section and page.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, structure_aware: bool = False):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError(f"chunk_overlap must be at least 0 and less than chunk_size ({chunk_size}), "
+                             f"got {chunk_overlap}")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.structure_aware = structure_aware
+    
+    @property
+    def tokenizer(self):
+        """The shared cl100k_base encoding, loaded on first use."""
+        return get_tokenizer("cl100k_base")
     
     def load_json_data(self, file_path: str) -> List[Dict[str, Any]]:
         """Load data from JSON file."""
         with open(file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     
+    def iter_json_records(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream records from a JSON array or JSON Lines file without loading it whole.
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            first = f.read(1)
+            while first and first.isspace():
+                first = f.read(1)
+            if not first:
+                return
+            if first == '[':
+                f.seek(0)
+                yield from _iter_json_array(f)
+                return
+            f.seek(0)
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    
     def create_chunks(self, text: str) -> List[str]:
         """Split text into overlapping chunks."""
-        tokens = self.tokenizer.encode(text)
-        chunks = []
+        return [chunk['text'] for chunk in self.iter_chunks([text])]
+    
+    def iter_chunks(self, texts: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Stream overlapping token windows over a sequence of text pieces.
         
-        for i in range(0, len(tokens), self.chunk_size - self.chunk_overlap):
-            chunk_tokens = tokens[i:i + self.chunk_size]
-            chunk_text = self.tokenizer.decode(chunk_tokens)
-            chunks.append(chunk_text)
-            
-            if i + self.chunk_size >= len(tokens):
-                break
+        The pieces (e.g. the pages of a LoadedDocument) are treated as one continuous
+        text. Each piece is tokenized once and a chunk is yielded as soon as its window
+        is full; its text is sliced from the source using token offsets rather than
+        decoded, and only the current window is kept in memory.
+        
+        Yields dicts with 'text', 'index', 'token_count', and the 'token_start'/'token_end'
+        and 'char_start'/'char_end' offsets of the chunk within the concatenated input.
+        """
+        step = self.chunk_size - self.chunk_overlap
+        buffer_text = ""
+        char_base = 0   # offset of buffer_text[0] in the full input
+        token_base = 0  # index of the first buffered token in the full input
+        offsets = []    # absolute char offset at which each buffered token starts
+        index = 0
+        
+        for text in texts:
+            for piece in split_text(text):
+                _, piece_offsets = self.tokenizer.decode_with_offsets(self.tokenizer.encode(piece))
+                piece_base = char_base + len(buffer_text)
+                offsets.extend(piece_base + offset for offset in piece_offsets)
+                buffer_text += piece
                 
-        return chunks
+                # Only emit a full window once a token beyond it exists, so the final
+                # window is the one that reaches the end of the input
+                while len(offsets) > self.chunk_size:
+                    yield self._make_chunk(buffer_text, char_base, offsets, self.chunk_size,
+                                           offsets[self.chunk_size], token_base, index)
+                    index += 1
+                    cut = offsets[step]
+                    buffer_text = buffer_text[cut - char_base:]
+                    char_base = cut
+                    del offsets[:step]
+                    token_base += step
+        
+        if offsets:
+            yield self._make_chunk(buffer_text, char_base, offsets, len(offsets),
+                                   char_base + len(buffer_text), token_base, index)
+    
+    def iter_document_chunks(self, pages: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Chunk the pages of a document, by section when structure_aware is set."""
+        if self.structure_aware:
+            return self.iter_section_chunks(pages)
+        return self.iter_chunks(pages)
+    
+    def iter_section_chunks(self, pages: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Stream token windows over the sections of consecutive pages.
+        
+        Each section (see structure.iter_sections) is windowed on its own, so a short
+        section becomes a single chunk. Yields the same fields as iter_chunks, with
+        offsets into the concatenated pages, plus the chunk's 'section' heading, its
+        'section_type' (the SECTION_KEYWORDS entry it names, or '') and the 'page'
+        the section starts on.
+        """
+        index = 0
+        token_base = 0
+        for section in iter_sections(pages):
+            labels = {'section': section['heading'], 'section_type': section['section_type'],
+                      'page': section['page']}
+            section_tokens = 0
+            for chunk in self.iter_chunks([section['text']]):
+                chunk.update(labels)
+                chunk['index'] = index
+                chunk['char_start'] += section['char_start']
+                chunk['char_end'] += section['char_start']
+                section_tokens = chunk['token_end']
+                chunk['token_start'] += token_base
+                chunk['token_end'] += token_base
+                index += 1
+                yield chunk
+            token_base += section_tokens
+    
+    @staticmethod
+    def _make_chunk(buffer_text: str, char_base: int, offsets: List[int], token_count: int,
+                    char_end: int, token_base: int, index: int) -> Dict[str, Any]:
+        char_start = offsets[0]
+        return {
+            'text': buffer_text[char_start - char_base:char_end - char_base],
+            'index': index,
+            'token_count': token_count,
+            'token_start': token_base,
+            'token_end': token_base + token_count,
+            'char_start': char_start,
+            'char_end': char_end
+        }
+    
+    @staticmethod
+    def offset_metadata(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """The token count and offsets of a chunk, and its section if known, to store alongside it."""
+        metadata = {field: chunk[field] for field in OFFSET_FIELDS}
+        metadata.update((field, chunk[field]) for field in SECTION_FIELDS if field in chunk)
+        return metadata
     
     def process_document(self, document: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Process a single document into chunks with metadata."""
         chunks = []
           # Combine title and abstract for processing
         text = f"Title: {document.get('title', '')}\n\nAbstract: {document.get('abstract', '')}"
-        text_chunks = self.create_chunks(text)
+        text_chunks = list(self.iter_chunks([text]))
         
         for i, chunk in enumerate(text_chunks):
             chunk_data = {
                 'chunk_id': f"{document.get('id', '')}_{i}",
-                'text': chunk,
+                'text': chunk['text'],
                 'metadata': {
                     'paper_id': document.get('id', ''),
                     'title': document.get('title', ''),
                     'authors': str(document.get('authors', [])),  # Convert list to string
                     'chunk_index': i,
-                    'total_chunks': len(text_chunks)
+                    'total_chunks': len(text_chunks),
+                    **self.offset_metadata(chunk)
                 }
             }
             chunks.append(chunk_data)
             
         return chunks
     
-    def process_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Process multiple documents into chunks."""
+    def process_documents(self, documents: List[Dict[str, Any]], max_workers: int = 1) -> List[Dict[str, Any]]:
+        """Process multiple documents into chunks, optionally across a process pool."""
+        if max_workers > 1:
+            all_chunks = []
+            for chunks in self.iter_chunk_batches(tqdm(documents, desc="Processing documents"),
+                                                  max_workers=max_workers):
+                all_chunks.extend(chunks)
+            return all_chunks
+        
         all_chunks = []
         for doc in tqdm(documents, desc="Processing documents"):
             chunks = self.process_document(doc)
             all_chunks.extend(chunks)
-        return all_chunks 
\ No newline at end of file
+        return all_chunks
+    
+    def iter_chunk_batches(self, documents: Iterable[Dict[str, Any]], max_workers: Optional[int] = None,
+                           documents_per_task: int = 64,
+                           max_pending: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Chunk a stream of documents in a process pool, yielding chunk lists in input order.
+        
+        At most max_pending tasks (default: twice the worker count) are in flight, and the
+        next task is only submitted once the caller has consumed the oldest result, so
+        memory stays bounded however long the input is.
+        """
+        documents = iter(documents)
+        if max_pending is None:
+            max_pending = 2 * (max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(self.chunk_size, self.chunk_overlap)) as executor:
+            pending = deque()
+            while True:
+                batch = list(islice(documents, documents_per_task))
+                if batch:
+                    pending.append(executor.submit(_process_batch, batch))
+                if not pending:
+                    break
+                if len(pending) >= max_pending or not batch:
+                    yield pending.popleft().result() 
\ No newline at end of file
@@ -1,81 +1,692 @@
 # filepath: d:\Abdullah\GENESYS RAG\src\embedding_manager.py
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Union
 import numpy as np
+from src.embedding_cache import EmbeddingCache
+from src.embedding_engine import EmbeddingEngine
+from src.lexical_index import BM25Index
+from src.vector_store import VectorStore, ChromaVectorStore, NumpyVectorStore
+from src.metrics import metrics
+from src.resources import get_chroma_client
+
+# Bumped whenever the on-disk layout below changes
+INDEX_FORMAT_VERSION = 1
+
 
 class EmbeddingManager:
-    def __init__(self, collection_name: str = "arxiv_papers"):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.client = chromadb.Client(Settings(
-            persist_directory="./chroma_db",
-            anonymized_telemetry=False
-        ))
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-    
-    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Create embeddings for a list of texts."""
-        embeddings = self.model.encode(texts)
-        return embeddings.tolist()
-    
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the Chroma DB collection."""
+    """
+    Embeds chunks and stores them in vector indexes.
+
+    With a persist_directory the index survives restarts, using this layout:
+
+        <persist_directory>/
+            manifest.json       format version, model name and dimension, document registry
+            chroma/             Chroma persistent client (shared corpus, large documents)
+            exact/<doc_id>.npz  snapshots of small documents served by NumpyVectorStore
+            lexical/<doc_id>.json
+                                BM25 inverted index of every document's chunks
+            pages/<doc_id>.json page texts and file type of uploaded documents
+
+    On start-up the manifest is checked against the configured model, and the
+    registered documents are loaded back so they are reused without re-indexing.
+    """
+
+    def __init__(self, collection_name: str = "arxiv_papers", model_name: str = 'all-MiniLM-L6-v2',
+                 cache_path: Optional[str] = "./embedding_cache/embeddings.sqlite3",
+                 cache_max_entries: int = 200000,
+                 max_documents: int = 32,
+                 document_ttl: Optional[float] = 24 * 3600,
+                 batch_size: int = 64,
+                 num_threads: Optional[int] = None,
+                 normalize: bool = False,
+                 dtype: str = "float32",
+                 engine: Optional[EmbeddingEngine] = None,
+                 exact_search_threshold: int = 2000,
+                 persist_directory: Optional[str] = "./chroma_db"):
+        self.engine = engine or EmbeddingEngine(model_name, batch_size=batch_size, num_threads=num_threads,
+                                                normalize=normalize, dtype=dtype)
+        self.model_name = self.engine.model_name
+        self.cache = EmbeddingCache(cache_path, max_entries=cache_max_entries) if cache_path else None
+        self.persist_directory = persist_directory
+        # Embedding dimension of the index, from the manifest or the first encoded vectors,
+        # so opening an index does not have to load the model
+        self._dimension = None
+        if persist_directory:
+            self._check_manifest()
+            self.client = get_chroma_client(os.path.join(persist_directory, "chroma"))
+        else:
+            self.client = get_chroma_client()
+        self.store = ChromaVectorStore(self.client, collection_name)
+        self.collection = self.store.collection
+        # Documents with at most this many chunks use exact in-memory search instead of HNSW
+        self.exact_search_threshold = exact_search_threshold
+        # Per-document namespaces, most recently used last: doc_id -> last access time
+        self.max_documents = max_documents
+        self.document_ttl = document_ttl
+        self._documents = OrderedDict()
+        self._stores = {}
+        self._lexical = {}
+        # Page texts of documents when nothing is persisted (see save_pages)
+        self._pages = {}
+        self._documents_lock = threading.RLock()
+        # doc_id -> [lock, callers holding or waiting for it] of documents being indexed,
+        # so concurrent add_document calls index a document once
+        self._indexing_locks = {}
+        # Embeddings of fixed queries (e.g. section lookups), computed once per process
+        self._query_embeddings = {}
+        if persist_directory:
+            self._load_documents()
+
+    @property
+    def model(self):
+        return self.engine.model
+
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension of the index. Loads the model only if nothing has recorded it yet."""
+        if self._dimension is None:
+            self._check_dimension(self.engine.dimension)
+        return self._dimension
+
+    def _check_dimension(self, dimension: int):
+        """Record the dimension of the first vectors, and refuse vectors of any other dimension."""
+        if self._dimension is None:
+            self._dimension = dimension
+        elif dimension != self._dimension:
+            raise ValueError(
+                f"Index in {self.persist_directory} holds vectors of dimension {self._dimension}, but model "
+                f"'{self.model_name}' produces dimension {dimension}. Use a different persist_directory "
+                f"or delete the index."
+            )
+
+    @staticmethod
+    def document_id(content: bytes) -> str:
+        """Derive a stable document id from the raw file content."""
+        return hashlib.sha256(content).hexdigest()[:32]
+
+    def create_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Create float32 embeddings for a list of texts, reusing cached vectors where possible.
+        
+        Returns an (n, dimension) array; vectors are cached in the engine's output dtype.
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        if self.cache is None:
+            with metrics.span("encode"):
+                embeddings = self.engine.encode(texts)
+            metrics.inc("texts_encoded", len(texts))
+            self._check_dimension(embeddings.shape[1])
+            return self.engine.to_float32(embeddings)
+
+        keys = [EmbeddingCache.make_key(self.model_name, text, self.engine.normalize, self.engine.dtype)
+                for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Encode each missing text once, even if it appears several times in the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        metrics.inc("embedding_cache_hits", len(vectors))
+        metrics.inc("embedding_cache_misses", len(missing))
+        if missing:
+            with metrics.span("encode"):
+                encoded = self.engine.encode(list(missing.values()))
+            metrics.inc("texts_encoded", len(missing))
+            new_vectors = dict(zip(missing.keys(), encoded))
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        # Taken from the vectors, so batches served from the cache never load the model
+        self._check_dimension(len(vectors[keys[0]]))
+        embeddings = np.empty((len(keys), self._dimension), dtype=np.float32)
+        for row, key in enumerate(keys):
+            embeddings[row] = self.engine.to_float32(vectors[key])
+        return embeddings
+
+    def add_documents(self, documents: List[Dict[str, Any]], doc_id: Optional[str] = None):
+        """Add documents to the Chroma DB collection, or to a document's own namespace."""
         ids = [doc['chunk_id'] for doc in documents]
         texts = [doc['text'] for doc in documents]
-        
+
         # Handle metadata - ensure it's not empty
         metadatas = []
         for doc in documents:
             # If metadata is empty, add a default value
             metadata = doc['metadata'] if doc['metadata'] else {"source": "document"}
             metadatas.append(metadata)
-        
+
         # Create embeddings
         embeddings = self.create_embeddings(texts)
-        
+
+        store = self._document_store(doc_id, size_hint=len(documents)) if doc_id else self.store
+        # Document namespaces also get a lexical index; the shared corpus is dense-only
+        lexical = self._document_lexical(doc_id) if doc_id else None
+
         # Add to collection
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=texts,
-            metadatas=metadatas
-        )
-    
-    def search(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar documents using a query."""
-        query_embedding = self.create_embeddings([query])[0]
-        
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
-        
+        with metrics.span("vector_add", backend=store.backend):
+            store.add(ids, embeddings, texts, metadatas)
+        if lexical is not None:
+            with metrics.span("lexical_add"):
+                lexical.add(ids, texts)
+
+    def add_document(self, doc_id: str, chunks: List[Dict[str, Any]]) -> bool:
+        """
+        Index the chunks of one document in its own namespace.
+
+        Returns False without doing any work if the document is already indexed.
+        A call made while another thread is indexing the same document waits for it
+        and returns False once it is done.
+        """
+        with self._documents_lock:
+            entry = self._indexing_locks.setdefault(doc_id, [threading.Lock(), 0])
+            entry[1] += 1
+            indexing_lock = entry[0]
+        try:
+            with indexing_lock:
+                if self.has_document(doc_id):
+                    return False
+                # Embedding happens outside the documents lock so other sessions can keep searching
+                try:
+                    if chunks:
+                        self.add_documents(chunks, doc_id=doc_id)
+                    else:
+                        self._document_store(doc_id, size_hint=0)
+                except Exception:
+                    # Leave no partial namespace for the next attempt to append to
+                    with self._documents_lock:
+                        self._drop_document(doc_id)
+                    raise
+                with self._documents_lock:
+                    store = self._stores.get(doc_id)
+                    if self.persist_directory and isinstance(store, NumpyVectorStore):
+                        store.save(self._snapshot_path(doc_id))
+                    if self.persist_directory and doc_id in self._lexical:
+                        self._lexical[doc_id].save(self._lexical_path(doc_id))
+                    self._touch_document(doc_id)
+                    self.evict_documents()
+                    self._save_manifest()
+                return True
+        finally:
+            with self._documents_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._indexing_locks[doc_id]
+
+    def has_document(self, doc_id: str) -> bool:
+        """Check whether a document namespace exists and has not expired."""
+        with self._documents_lock:
+            self.evict_documents()
+            if doc_id in self._documents:
+                self._touch_document(doc_id)
+                return True
+            return False
+
+    def document_chunk_count(self, doc_id: str) -> int:
+        """Get the number of chunks stored for a document."""
+        store = self._stores.get(doc_id)
+        return store.count() if store is not None else 0
+
+    def evict_documents(self):
+        """Drop document namespaces past their TTL, then the least recently used over capacity."""
+        with self._documents_lock:
+            before = set(self._documents)
+            now = time.time()
+            if self.document_ttl is not None:
+                expired = [doc_id for doc_id, last_used in self._documents.items()
+                           if now - last_used > self.document_ttl]
+                for doc_id in expired:
+                    self._drop_document(doc_id)
+            while len(self._documents) > self.max_documents:
+                oldest = next(iter(self._documents))
+                self._drop_document(oldest)
+            if before - set(self._documents):
+                self._save_manifest()
+
+    def _touch_document(self, doc_id: str):
+        self._documents[doc_id] = time.time()
+        self._documents.move_to_end(doc_id)
+
+    def _drop_document(self, doc_id: str):
+        self._documents.pop(doc_id, None)
+        store = self._stores.pop(doc_id, None)
+        if store is not None:
+            store.drop()
+        self._lexical.pop(doc_id, None)
+        self._pages.pop(doc_id, None)
+        if self.persist_directory:
+            for path in (self._snapshot_path(doc_id), self._lexical_path(doc_id), self._pages_path(doc_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    def _collection_name(doc_id: str) -> str:
+        return f"doc_{doc_id}"
+
+    def _document_store(self, doc_id: str, size_hint: int) -> VectorStore:
+        """Get a document's store, creating one suited to its size on first use."""
+        with self._documents_lock:
+            store = self._stores.get(doc_id)
+            if store is None:
+                if size_hint <= self.exact_search_threshold:
+                    store = NumpyVectorStore(self.dimension, initial_capacity=max(size_hint, 1))
+                else:
+                    store = ChromaVectorStore(self.client, self._collection_name(doc_id))
+                self._stores[doc_id] = store
+            return store
+
+    def _document_lexical(self, doc_id: str) -> BM25Index:
+        """Get a document's lexical index, building it from the stored chunks if it has none yet."""
+        with self._documents_lock:
+            index = self._lexical.get(doc_id)
+            if index is None:
+                index = BM25Index()
+                store = self._stores.get(doc_id)
+                if store is not None and store.count():
+                    # Indexed before lexical indexes existed, or the index file was lost
+                    contents = store.get()
+                    index.add(contents["ids"], contents["documents"])
+                    if self.persist_directory:
+                        index.save(self._lexical_path(doc_id))
+                self._lexical[doc_id] = index
+            return index
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.persist_directory, "manifest.json")
+
+    def _snapshot_path(self, doc_id: str) -> str:
+        return os.path.join(self.persist_directory, "exact", f"{doc_id}.npz")
+
+    def _lexical_path(self, doc_id: str) -> str:
+        return os.path.join(self.persist_directory, "lexical", f"{doc_id}.json")
+
+    def _pages_path(self, doc_id: str) -> str:
+        return os.path.join(self.persist_directory, "pages", f"{doc_id}.json")
+
+    def _check_manifest(self):
+        """
+        Refuse to open an index that was built with a different embedding model.
+
+        Only the format version and model name are compared here; the recorded
+        dimension is checked against the first vectors encoded (see _check_dimension).
+        """
+        os.makedirs(os.path.join(self.persist_directory, "exact"), exist_ok=True)
+        os.makedirs(os.path.join(self.persist_directory, "lexical"), exist_ok=True)
+        os.makedirs(os.path.join(self.persist_directory, "pages"), exist_ok=True)
+        if not os.path.exists(self._manifest_path()):
+            return
+        with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        expected = (INDEX_FORMAT_VERSION, self.model_name)
+        found = (manifest.get("format_version"), manifest.get("model_name"))
+        if found != expected:
+            raise ValueError(
+                f"Index in {self.persist_directory} was built with format {found[0]}, model '{found[1]}', "
+                f"but this manager uses format {expected[0]}, model '{expected[1]}'. "
+                f"Use a different persist_directory or delete the index."
+            )
+        self._dimension = manifest.get("dimension")
+
+    def _save_manifest(self):
+        if not self.persist_directory:
+            return
+        manifest = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "model_name": self.model_name,
+            "dimension": self._dimension,
+            "documents": {
+                doc_id: {
+                    "last_used": last_used,
+                    "backend": self._stores[doc_id].backend
+                }
+                for doc_id, last_used in self._documents.items()
+            }
+        }
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _load_documents(self):
+        """Warm-start the document registry from the manifest."""
+        if not os.path.exists(self._manifest_path()):
+            self._save_manifest()
+            return
+        with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+            documents = json.load(f).get("documents", {})
+        with self._documents_lock:
+            for doc_id, entry in sorted(documents.items(), key=lambda item: item[1]["last_used"]):
+                if entry["backend"] == "exact":
+                    if not os.path.exists(self._snapshot_path(doc_id)):
+                        continue
+                    self._stores[doc_id] = NumpyVectorStore.load(self._snapshot_path(doc_id))
+                else:
+                    self._stores[doc_id] = ChromaVectorStore(self.client, self._collection_name(doc_id))
+                index = BM25Index.load(self._lexical_path(doc_id))
+                if index is not None:
+                    self._lexical[doc_id] = index
+                self._documents[doc_id] = entry["last_used"]
+            self.evict_documents()
+            self._save_manifest()
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        Vacuum the persistent index.
+
+        Evicts expired documents, removes Chroma collections and snapshots that no
+        registered document refers to, and reclaims free pages in the embedding cache.
+
+        Chroma's own chroma.sqlite3 is not vacuumed: the PersistentClient is shared
+        process-wide (see get_chroma_client) and keeps the file open, and a VACUUM
+        through a second connection would rewrite it under the client and fail or
+        block while the client writes. Chroma reuses the pages freed by deleted
+        collections.
+        """
+        stats = {"orphan_collections": 0, "orphan_snapshots": 0, "orphan_lexical_indexes": 0, "orphan_pages": 0}
+        with self._documents_lock:
+            self.evict_documents()
+            for collection in self.client.list_collections():
+                name = getattr(collection, "name", collection)
+                doc_id = name[len("doc_"):] if name.startswith("doc_") else None
+                if doc_id and not isinstance(self._stores.get(doc_id), ChromaVectorStore):
+                    self.client.delete_collection(name)
+                    stats["orphan_collections"] += 1
+            if self.persist_directory:
+                exact_dir = os.path.join(self.persist_directory, "exact")
+                for file_name in os.listdir(exact_dir):
+                    doc_id = file_name.split(".", 1)[0]
+                    if not isinstance(self._stores.get(doc_id), NumpyVectorStore) or not file_name.endswith(".npz") \
+                            or file_name.endswith(".tmp.npz"):
+                        os.remove(os.path.join(exact_dir, file_name))
+                        stats["orphan_snapshots"] += 1
+                lexical_dir = os.path.join(self.persist_directory, "lexical")
+                for file_name in os.listdir(lexical_dir):
+                    doc_id = file_name.split(".", 1)[0]
+                    if doc_id not in self._stores or not file_name.endswith(".json"):
+                        os.remove(os.path.join(lexical_dir, file_name))
+                        stats["orphan_lexical_indexes"] += 1
+                pages_dir = os.path.join(self.persist_directory, "pages")
+                for file_name in os.listdir(pages_dir):
+                    doc_id = file_name.split(".", 1)[0]
+                    if doc_id not in self._stores or not file_name.endswith(".json"):
+                        os.remove(os.path.join(pages_dir, file_name))
+                        stats["orphan_pages"] += 1
+                self._save_manifest()
+        if self.cache is not None:
+            self.cache.vacuum()
+        stats["documents"] = len(self._documents)
+        return stats
+
+    def precompute_queries(self, queries: List[str]):
+        """Encode fixed queries once and keep their embeddings in memory for later searches."""
+        missing = [query for query in dict.fromkeys(queries) if query not in self._query_embeddings]
+        if missing:
+            self._query_embeddings.update(zip(missing, self.create_embeddings(missing)))
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries in one model call, using precomputed embeddings where available."""
+        missing = [query for query in dict.fromkeys(queries) if query not in self._query_embeddings]
+        fresh = dict(zip(missing, self.create_embeddings(missing))) if missing else {}
+        return np.stack([self._query_embeddings[query] if query in self._query_embeddings else fresh[query]
+                         for query in queries])
+
+    def search(self, query: str, n_results: int = 5, doc_id: Optional[str] = None,
+               include_embeddings: bool = False, where: Optional[Dict[str, Any]] = None,
+               query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents using a query, optionally within a single document."""
+        return self.search_many([query], n_results=n_results, doc_id=doc_id, include_embeddings=include_embeddings,
+                                where=where,
+                                query_embeddings=None if query_embedding is None else query_embedding[None])[0]
+
+    def search_many(self, queries: List[str], n_results: Union[int, List[int]] = 5,
+                    doc_id: Optional[str] = None, include_embeddings: bool = False,
+                    where: Optional[Dict[str, Any]] = None,
+                    query_embeddings: Optional[np.ndarray] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries with one encoder call and one vector store query.
+
+        n_results is either shared by all queries or given per query. Returns one
+        result list per query, in the same order as the queries. With
+        include_embeddings every result also carries its stored 'embedding'; where
+        restricts the search to chunks whose metadata matches the filter. Callers
+        that already encoded the queries (one row per query) pass query_embeddings
+        to skip the encoder.
+        """
+        if not queries:
+            return []
+        if isinstance(n_results, int):
+            n_results = [n_results] * len(queries)
+
+        if doc_id:
+            with self._documents_lock:
+                if doc_id not in self._documents:
+                    return [[] for _ in queries]
+                store = self._stores[doc_id]
+                self._touch_document(doc_id)
+        else:
+            store = self.store
+
+        max_results = min(max(n_results), store.count())
+        if max_results <= 0:
+            return [[] for _ in queries]
+
+        if query_embeddings is None:
+            query_embeddings = self.embed_queries(queries)
+        with metrics.span("vector_query", backend=store.backend):
+            results = store.query(query_embeddings, max_results, include_embeddings=include_embeddings, where=where)
+        metrics.inc("queries", len(queries), backend=store.backend)
+
         # Format results
-        formatted_results = []
-        for i in range(len(results['ids'][0])):
-            formatted_results.append({
-                'id': results['ids'][0][i],
-                'text': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'distance': results['distances'][0][i] if 'distances' in results else None
-            })
-        
-        return formatted_results
-    
+        all_results = []
+        for q, limit in enumerate(n_results):
+            formatted_results = []
+            for i in range(min(limit, len(results['ids'][q]))):
+                result = {
+                    'id': results['ids'][q][i],
+                    'text': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'distance': results['distances'][q][i] if results.get('distances') else None
+                }
+                if include_embeddings:
+                    result['embedding'] = np.asarray(results['embeddings'][q][i], dtype=np.float32)
+                formatted_results.append(result)
+            all_results.append(formatted_results)
+
+        return all_results
+
+    def save_pages(self, doc_id: str, pages: List[str], file_type: str):
+        """
+        Keep the page texts of an indexed document, so callers can reload them by
+        doc_id instead of carrying them around. They are dropped with the document.
+        """
+        with self._documents_lock:
+            if doc_id not in self._documents:
+                return
+            if not self.persist_directory:
+                self._pages[doc_id] = {"pages": list(pages), "file_type": file_type}
+                return
+            tmp_path = self._pages_path(doc_id) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"pages": list(pages), "file_type": file_type}, f)
+            os.replace(tmp_path, self._pages_path(doc_id))
+
+    def has_pages(self, doc_id: str) -> bool:
+        """Check whether the page texts of a document are stored."""
+        if not self.persist_directory:
+            return doc_id in self._pages
+        return os.path.exists(self._pages_path(doc_id))
+
+    def load_pages(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get the stored {"pages", "file_type"} of a document, or None if they are not stored."""
+        if not self.persist_directory:
+            return self._pages.get(doc_id)
+        try:
+            with open(self._pages_path(doc_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def get_chunks(self, doc_id: str, where: Optional[Dict[str, Any]] = None,
+                   include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get a document's chunks whose metadata matches where (all of them by default),
+        in document order, without running a query.
+        """
+        with self._documents_lock:
+            if doc_id not in self._documents:
+                return []
+            store = self._stores[doc_id]
+            self._touch_document(doc_id)
+        with metrics.span("vector_get", backend=store.backend):
+            contents = store.get(where=where, include_embeddings=include_embeddings)
+        chunks = []
+        for row, chunk_id in enumerate(contents['ids']):
+            chunk = {
+                'id': chunk_id,
+                'text': contents['documents'][row],
+                'metadata': contents['metadatas'][row],
+                'distance': None
+            }
+            if include_embeddings:
+                chunk['embedding'] = np.asarray(contents['embeddings'][row], dtype=np.float32)
+            chunks.append(chunk)
+        return sorted(chunks, key=lambda chunk: (chunk['metadata'] or {}).get('index', 0))
+
+    def lexical_search(self, query: str, n_results: int = 5, doc_id: Optional[str] = None,
+                       include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """Search a document's chunks by BM25 keyword score, without calling the embedding model."""
+        return self.lexical_search_many([query], n_results=n_results, doc_id=doc_id,
+                                        include_embeddings=include_embeddings)[0]
+
+    def lexical_search_many(self, queries: List[str], n_results: Union[int, List[int]] = 5,
+                            doc_id: Optional[str] = None,
+                            include_embeddings: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several keyword queries in a document's BM25 index.
+
+        Results look like those of search_many, with the BM25 'score' and no
+        'distance'. Only chunks sharing a term with the query are returned. The
+        shared corpus (doc_id None) has no lexical index and returns no results.
+        """
+        if not queries:
+            return []
+        if isinstance(n_results, int):
+            n_results = [n_results] * len(queries)
+        if not doc_id:
+            return [[] for _ in queries]
+        with self._documents_lock:
+            if doc_id not in self._documents:
+                return [[] for _ in queries]
+            store = self._stores[doc_id]
+            self._touch_document(doc_id)
+            index = self._document_lexical(doc_id)
+
+        with metrics.span("lexical_query"):
+            hits = [index.query(query, limit) for query, limit in zip(queries, n_results)]
+        metrics.inc("lexical_queries", len(queries))
+
+        # Fetch the text and metadata of every hit with one store lookup
+        hit_ids = list(dict.fromkeys(chunk_id for query_hits in hits for chunk_id, _ in query_hits))
+        contents = store.get(hit_ids, include_embeddings=include_embeddings) if hit_ids else {"ids": []}
+        rows = {chunk_id: row for row, chunk_id in enumerate(contents["ids"])}
+
+        all_results = []
+        for query_hits in hits:
+            formatted_results = []
+            for chunk_id, score in query_hits:
+                row = rows.get(chunk_id)
+                if row is None:
+                    continue
+                result = {
+                    'id': chunk_id,
+                    'text': contents['documents'][row],
+                    'metadata': contents['metadatas'][row],
+                    'distance': None,
+                    'score': score
+                }
+                if include_embeddings:
+                    result['embedding'] = np.asarray(contents['embeddings'][row], dtype=np.float32)
+                formatted_results.append(result)
+            all_results.append(formatted_results)
+        return all_results
+
+    def hybrid_search(self, query: str, n_results: int = 5, doc_id: Optional[str] = None,
+                      alpha: float = 0.5, include_embeddings: bool = False,
+                      query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """
+        Search with both the vector index and the BM25 index and fuse the two rankings.
+
+        Each side's scores (cosine similarity, BM25) are min-max normalized over its
+        candidates and combined as alpha * dense + (1 - alpha) * lexical; a chunk
+        found by only one side gets 0 from the other. The fused value is returned as
+        'score'. Without a lexical index (the shared corpus) this is a dense search.
+        """
+        candidates = max(4 * n_results, 20)
+        dense = self.search(query, n_results=candidates, doc_id=doc_id, include_embeddings=include_embeddings,
+                            query_embedding=query_embedding)
+        lexical = self.lexical_search(query, n_results=candidates, doc_id=doc_id,
+                                      include_embeddings=include_embeddings)
+
+        fused = {}
+        dense_scores = _min_max([1.0 - item['distance'] for item in dense])
+        for item, score in zip(dense, dense_scores):
+            fused[item['id']] = [item, alpha * score]
+        for item, score in zip(lexical, _min_max([item['score'] for item in lexical])):
+            entry = fused.setdefault(item['id'], [item, 0.0])
+            entry[1] += (1 - alpha) * score
+
+        ranked = sorted(fused.values(), key=lambda entry: -entry[1])[:n_results]
+        return [dict(item, score=score) for item, score in ranked]
+
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the collection."""
-        return {
+        stats = {
             "count": self.collection.count(),
-            "name": self.collection.name
+            "name": self.collection.name,
+            "documents": len(self._documents),
+            "exact_search_documents": sum(isinstance(store, NumpyVectorStore) for store in self._stores.values()),
+            "lexical_indexes": len(self._lexical)
         }
+        if self.cache is not None:
+            stats["embedding_cache"] = self.cache.stats()
+        return stats
     def clear_documents(self):
         """Clear all documents from the Chroma DB collection."""
-        # Get all document IDs first
-        all_docs = self.collection.get()
+        # Only fetch the ids, not the stored documents and metadata
+        all_docs = self.collection.get(include=[])
         if all_docs['ids']:
             # Delete all documents by their IDs
             self.collection.delete(ids=all_docs['ids'])
+
+
+def _min_max(scores: List[float]) -> List[float]:
+    """Scale scores to [0, 1]; all equal scores become 1."""
+    if not scores:
+        return []
+    low, high = min(scores), max(scores)
+    if high - low < 1e-12:
+        return [1.0] * len(scores)
+    return [(score - low) / (high - low) for score in scores]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the persistent vector index.")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--model", default='all-MiniLM-L6-v2')
+    args = parser.parse_args()
+
+    manager = EmbeddingManager(model_name=args.model, persist_directory=args.persist_directory)
+    result = manager.compact() if args.command == "compact" else manager.get_collection_stats()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
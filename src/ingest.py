@@ -0,0 +1,78 @@
+"""
+Bulk ingestion of JSON / JSON Lines corpora (e.g. arXiv metadata dumps).
+
+Usage:
+    python -m src.ingest arxiv-metadata.json --workers 8 --batch-size 256
+"""
+import argparse
+from typing import Dict, Any, Iterable, Optional
+from tqdm import tqdm
+from src.document_processor import DocumentProcessor
+from src.embedding_manager import EmbeddingManager
+
+
+def ingest_documents(documents: Iterable[Dict[str, Any]], processor: DocumentProcessor,
+                     embed_manager: EmbeddingManager, batch_size: int = 256,
+                     max_workers: Optional[int] = None, documents_per_task: int = 64,
+                     max_pending: Optional[int] = None) -> Dict[str, int]:
+    """
+    Chunk a stream of documents in a process pool and index the chunks in fixed-size batches.
+
+    Chunking results are consumed in order and each full batch is embedded and
+    written before more work is submitted, so at most max_pending chunking tasks
+    plus one batch of chunks are held in memory at a time.
+    """
+    stats = {"documents": 0, "chunks": 0, "batches": 0}
+    buffer = []
+
+    def flush(force: bool = False):
+        while len(buffer) >= batch_size or (force and buffer):
+            batch = buffer[:batch_size]
+            del buffer[:batch_size]
+            embed_manager.add_documents(batch)
+            stats["chunks"] += len(batch)
+            stats["batches"] += 1
+
+    def counted(items):
+        for item in items:
+            stats["documents"] += 1
+            yield item
+
+    progress = tqdm(desc="Ingesting chunks", unit="chunk")
+    for chunks in processor.iter_chunk_batches(counted(documents), max_workers=max_workers,
+                                               documents_per_task=documents_per_task,
+                                               max_pending=max_pending):
+        buffer.extend(chunks)
+        progress.update(len(chunks))
+        flush()
+    flush(force=True)
+    progress.close()
+    return stats
+
+
+def ingest_json_file(file_path: str, processor: DocumentProcessor, embed_manager: EmbeddingManager,
+                     **kwargs) -> Dict[str, int]:
+    """Stream a JSON array or JSON Lines file into the embedding manager's collection."""
+    return ingest_documents(processor.iter_json_records(file_path), processor, embed_manager, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-index a JSON or JSON Lines corpus.")
+    parser.add_argument("path", help="JSON array or JSON Lines file of documents")
+    parser.add_argument("--collection", default="arxiv_papers", help="Chroma collection to add chunks to")
+    parser.add_argument("--workers", type=int, default=None, help="Chunking processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per add_documents call")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    processor = DocumentProcessor(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    embed_manager = EmbeddingManager(collection_name=args.collection)
+    stats = ingest_json_file(args.path, processor, embed_manager,
+                             batch_size=args.batch_size, max_workers=args.workers)
+    print(f"Indexed {stats['chunks']} chunks from {stats['documents']} documents "
+          f"in {stats['batches']} batches.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Background jobs: a thread pool that runs ingest and summarize work outside the
+Streamlit script, with job state and progress kept in SQLite.
+
+A job is identified by its kind and a key naming everything its result depends
+on, so identical jobs submitted by different sessions (or by reruns of the
+same session) run once and share the result.
+
+Several processes may share one job database. Each queue owns the jobs it runs
+and renews a heartbeat on them while they are active; a queued or running job
+whose heartbeat has lapsed (its process died) is marked failed by whichever
+queue next looks at it.
+
+Usage:
+    jobs = JobQueue(max_workers=2)
+    job_id = jobs.submit("summary", f"{doc_id}|basic", basic_summary_job, embed_manager, summarizer, doc_id)
+    job = jobs.get(job_id)     # status, progress, message, partial, result, error
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from src.metrics import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Progress of running jobs is written to SQLite at most this often; readers in
+# this process see every update immediately
+PROGRESS_WRITE_INTERVAL = 0.5
+# Active jobs whose heartbeat is older than this are considered abandoned by a dead process
+JOB_LEASE = 30.0
+
+_COLUMNS = ("id", "kind", "key", "status", "progress", "message", "partial", "result", "error", "trace",
+            "created", "started", "finished", "owner", "heartbeat")
+_JSON_COLUMNS = ("partial", "result", "trace")
+
+
+class JobQueue:
+    """
+    Runs jobs on a thread pool and tracks them in a SQLite table.
+
+    A job function is called as func(progress, *args, **kwargs) and returns a
+    JSON-serializable result. It reports progress by calling
+    progress(fraction, message="", partial=None), where partial is any
+    JSON-serializable intermediate result (e.g. the summary streamed so far).
+
+    Submitting a job that is queued, running or finished returns the existing job
+    instead of starting another; a failed job is run again. Jobs left queued or
+    running by a process that stopped renewing their heartbeat for JOB_LEASE
+    seconds are marked failed.
+    """
+
+    def __init__(self, path: Optional[str] = "./jobs/jobs.sqlite3", max_workers: int = 2,
+                 max_age: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        # State of the jobs of this process, newest progress included
+        self._live = {}
+        self._last_write = {}
+        self._lock = threading.Lock()
+        # Identifies this queue's jobs among those of other processes sharing the database
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._closed = threading.Event()
+
+        directory = os.path.dirname(path) if path else ""
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, key TEXT NOT NULL, status TEXT NOT NULL, "
+            "progress REAL NOT NULL, message TEXT, partial TEXT, result TEXT, error TEXT, trace TEXT, "
+            "created REAL NOT NULL, started REAL, finished REAL, owner TEXT, heartbeat REAL)"
+        )
+        # Databases created before jobs had owners
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished)")
+        now = time.time()
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? "
+            "WHERE status IN (?, ?) AND (heartbeat IS NULL OR heartbeat < ?)",
+            (FAILED, "Interrupted: the process running it stopped", now, *ACTIVE_STATUSES, now - JOB_LEASE)
+        )
+        if max_age is not None:
+            self._conn.execute("DELETE FROM jobs WHERE finished < ?", (now - max_age,))
+        self._conn.commit()
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    @staticmethod
+    def job_id(kind: str, key: str) -> str:
+        """Deterministic id of the job of a kind with a key."""
+        return hashlib.sha256(f"{kind}|{key}".encode('utf-8')).hexdigest()[:32]
+
+    def submit(self, kind: str, key: str, func: Callable[..., Any], *args, **kwargs) -> str:
+        """Queue func unless the same job is queued, running or done already. Returns the job id."""
+        job_id = self.job_id(kind, key)
+        with self._lock:
+            job = self._load(job_id)
+            if job is not None and job["status"] != FAILED:
+                metrics.inc("jobs_coalesced", kind=kind)
+                return job_id
+            now = time.time()
+            job = {column: None for column in _COLUMNS}
+            job.update(id=job_id, kind=kind, key=key, status=QUEUED, progress=0.0, message="Queued", created=now,
+                       owner=self.owner)
+            self._live[job_id] = job
+            self._write(job)
+        metrics.inc("jobs_submitted", kind=kind)
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The current state of a job, or None if it is unknown."""
+        with self._lock:
+            job = self._load(job_id)
+            return dict(job) if job is not None else None
+
+    def discard(self, job_id: str) -> bool:
+        """Forget a finished or failed job, so the next submit runs it again. Active jobs are kept."""
+        with self._lock:
+            if job_id in self._live:
+                return False
+            deleted = self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def wait(self, job_id: str, on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+             poll_interval: float = 0.25, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Poll a job until it is done or failed, calling on_update with its state
+        whenever its progress changes. Returns the final state.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        seen = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job {job_id}")
+            state = (job["status"], job["progress"], job["message"], json.dumps(job["partial"]))
+            if on_update is not None and state != seen:
+                on_update(job)
+            seen = state
+            if job["status"] not in ACTIVE_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} did not finish in {timeout}s")
+            time.sleep(poll_interval)
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """The most recently created jobs, optionally only those with a status."""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params = []
+        if status is not None:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            return [dict(self._live.get(row[0]) or self._decode(row)) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts by status, and the worker count."""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"workers": self.max_workers, **{status: counts.get(status, 0)
+                                                 for status in (QUEUED, RUNNING, DONE, FAILED)}}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+        self._closed.set()
+        with self._lock:
+            self._conn.close()
+
+    def _heartbeat(self):
+        """Renew the heartbeat of this queue's active jobs, so other processes see them alive."""
+        while not self._closed.wait(JOB_LEASE / 3):
+            with self._lock:
+                if self._closed.is_set():
+                    return
+                if self._live:
+                    self._conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+                                       (time.time(), self.owner, *ACTIVE_STATUSES))
+                    self._conn.commit()
+
+    def _run(self, job_id: str, func: Callable[..., Any], args, kwargs):
+        job = self._live[job_id]
+
+        def progress(fraction: float, message: str = "", partial: Any = None):
+            with self._lock:
+                job.update(progress=min(max(fraction, 0.0), 1.0), message=message)
+                if partial is not None:
+                    job["partial"] = partial
+                if time.monotonic() - self._last_write.get(job_id, 0.0) >= PROGRESS_WRITE_INTERVAL:
+                    self._write(job)
+
+        with self._lock:
+            job.update(status=RUNNING, started=time.time(), message="Running")
+            self._write(job)
+        metrics.inc("jobs_started", kind=job["kind"])
+        with metrics.trace("job", attributes={"job_id": job_id, "key": job["key"]}, kind=job["kind"]) as trace:
+            try:
+                result = func(progress, *args, **kwargs)
+            except Exception as e:
+                result = None
+                error = f"{type(e).__name__}: {e}"
+            else:
+                error = None
+        with self._lock:
+            try:
+                job.update(status=FAILED if error else DONE, progress=job["progress"] if error else 1.0,
+                           message="Failed" if error else "Done", result=result, error=error,
+                           trace=trace.to_dict(), finished=time.time())
+                try:
+                    self._write(job)
+                except (TypeError, ValueError) as e:
+                    # A result or partial the job table cannot store fails the job
+                    job.update(status=FAILED, message="Failed", result=None, partial=None,
+                               error=f"Result is not JSON-serializable: {type(e).__name__}: {e}")
+                    self._write(job)
+            finally:
+                # Even if the row cannot be written, stop renewing it so its lease expires
+                del self._live[job_id]
+                self._last_write.pop(job_id, None)
+        metrics.inc("jobs_finished", kind=job["kind"], status=job["status"])
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._live.get(job_id)
+        if job is not None:
+            return job
+        row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._decode(row)
+        if job["status"] in ACTIVE_STATUSES and (job["heartbeat"] or 0.0) < time.time() - JOB_LEASE:
+            # Run by a process that has died since
+            job.update(status=FAILED, error="Interrupted: the process running it stopped", finished=time.time())
+            self._write(job)
+        return job
+
+    def _write(self, job: Dict[str, Any]):
+        if job["owner"] == self.owner and job["status"] in ACTIVE_STATUSES:
+            job["heartbeat"] = time.time()
+        values = [json.dumps(job[column]) if column in _JSON_COLUMNS and job[column] is not None else job[column]
+                  for column in _COLUMNS]
+        self._conn.execute(f"INSERT OR REPLACE INTO jobs ({', '.join(_COLUMNS)}) "
+                           f"VALUES ({', '.join('?' * len(_COLUMNS))})", values)
+        self._conn.commit()
+        self._last_write[job["id"]] = time.monotonic()
+
+    @staticmethod
+    def _decode(row) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        for column in _JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
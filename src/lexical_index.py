@@ -0,0 +1,95 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import List, Tuple, Optional
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric terms of a text."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index over the chunks of one document, scored with Okapi BM25.
+
+    Postings map every term to the rows of the chunks containing it and the term
+    frequency in each, so a query only touches the chunks sharing a term with it
+    and needs no embedding model.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.lengths = []
+        # term -> ([chunk rows], [term frequencies])
+        self.postings = {}
+        self._norms = None
+
+    def add(self, ids: List[str], documents: List[str]):
+        for chunk_id, text in zip(ids, documents):
+            row = len(self.ids)
+            terms = Counter(tokenize(text))
+            self.ids.append(chunk_id)
+            self.lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                rows, frequencies = self.postings.setdefault(term, ([], []))
+                rows.append(row)
+                frequencies.append(frequency)
+        self._norms = None
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def query(self, query: str, n_results: int) -> List[Tuple[str, float]]:
+        """Get the (chunk id, score) pairs of the best n_results chunks matching any query term."""
+        if not self.ids or n_results <= 0:
+            return []
+        norms = self._norms
+        if norms is None:
+            # Per-chunk length normalization, recomputed only after new chunks are added
+            lengths = np.asarray(self.lengths, dtype=np.float64)
+            norms = self._norms = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1e-12))
+
+        total = len(self.ids)
+        scores = np.zeros(total)
+        for term in dict.fromkeys(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            rows = np.asarray(posting[0])
+            frequencies = np.asarray(posting[1], dtype=np.float64)
+            idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norms[rows])
+
+        matched = np.flatnonzero(scores)
+        top = matched[np.argsort(-scores[matched], kind="stable")[:n_results]]
+        return [(self.ids[row], float(scores[row])) for row in top]
+
+    def save(self, path: str):
+        """Write the index to a JSON file, replacing any previous one atomically."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"k1": self.k1, "b": self.b, "ids": self.ids, "lengths": self.lengths,
+                       "postings": self.postings}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """Load an index written by save(), or None if the file is missing or unreadable."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        index = cls(k1=data["k1"], b=data["b"])
+        index.ids = data["ids"]
+        index.lengths = data["lengths"]
+        index.postings = {term: (rows, frequencies) for term, (rows, frequencies) in data["postings"].items()}
+        return index
@@ -0,0 +1,161 @@
+import json
+import os
+import random
+import threading
+import time
+from typing import Iterator, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from src.metrics import metrics
+
+DEFAULT_GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_GEMINI_MODEL = "gemini-1.5-flash"
+# Statuses worth retrying: rate limited or a transient server-side failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when the language model cannot produce a response."""
+
+
+class LLMClient:
+    """Interface of the language model backends used by Summarizer."""
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yield the response in pieces as they arrive. Defaults to one piece."""
+        yield self.generate(prompt)
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing requests_per_minute requests, with bursts up to burst."""
+
+    def __init__(self, requests_per_minute: float, burst: Optional[int] = None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(1, int(self.rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class GeminiClient(LLMClient):
+    """
+    Client for the Gemini generateContent REST API.
+
+    One pooled requests.Session is shared by all threads, so calls reuse
+    keep-alive connections instead of opening a new one each time. Calls are
+    rate limited, time out, and retry transient failures with exponential backoff.
+    """
+
+    def __init__(self, api_key: Optional[str], model: str = DEFAULT_GEMINI_MODEL,
+                 base_url: str = DEFAULT_GEMINI_BASE_URL, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, max_retries: int = 3, backoff: float = 1.0,
+                 requests_per_minute: float = 60, pool_size: int = 8):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def generate(self, prompt: str) -> str:
+        response = self._post("generateContent", prompt)
+        return self._extract_text(response.json())
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        response = self._post("streamGenerateContent", prompt, stream=True)
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data:"):
+                    text = self._extract_text(json.loads(line[len("data:"):]))
+                    if text:
+                        yield text
+
+    def _post(self, method: str, prompt: str, stream: bool = False) -> requests.Response:
+        url = f"{self.base_url}/models/{self.model}:{method}"
+        params = {"alt": "sse"} if stream else None
+        headers = {"x-goog-api-key": self.api_key} if self.api_key else {}
+        payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if attempt:
+                metrics.inc("llm_retries")
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, params=params, headers=headers, json=payload,
+                                             timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.inc("llm_requests", status=type(e).__name__)
+                error = LLMError(f"Request to {url} failed: {e}")
+                retry_after = None
+            else:
+                # For streamed calls this is the time until the response headers arrive
+                metrics.record_span("llm_request", start, time.perf_counter() - start, method=method)
+                metrics.inc("llm_requests", status=response.status_code)
+                if response.status_code < 400:
+                    return response
+                error = LLMError(f"Request to {url} failed with status {response.status_code}: "
+                                 f"{response.text[:200]}")
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+                retry_after = response.headers.get("Retry-After")
+            if attempt == self.max_retries:
+                raise error
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.1)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
+
+    @staticmethod
+    def _extract_text(data: dict) -> str:
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    def close(self):
+        self.session.close()
+
+
+def create_llm_client(backend: Optional[str] = None) -> Optional[LLMClient]:
+    """
+    Build the LLM client selected by SUMMARIZER_BACKEND.
+
+    "heuristic" (the default) returns None, which keeps Summarizer on its built-in
+    keyword summaries. "gemini" calls the Gemini API; point GEMINI_BASE_URL at a
+    local src.mock_llm_server to run against the stand-in server instead.
+    """
+    backend = (backend or os.getenv("SUMMARIZER_BACKEND", "heuristic")).lower()
+    if backend == "heuristic":
+        return None
+    if backend == "gemini":
+        return GeminiClient(
+            api_key=os.getenv("GEMINI_API_KEY"),
+            model=os.getenv("GEMINI_MODEL", DEFAULT_GEMINI_MODEL),
+            base_url=os.getenv("GEMINI_BASE_URL", DEFAULT_GEMINI_BASE_URL)
+        )
+    raise ValueError(f"Unknown summarizer backend '{backend}'")
@@ -0,0 +1,292 @@
+"""
+Process-wide instrumentation: timing spans, counters and histograms, exported in
+the Prometheus text format, plus optional per-request traces.
+
+Usage:
+    from src.metrics import metrics
+
+    with metrics.span("embed", backend="numpy"):
+        ...
+    metrics.inc("chunks", 12)
+
+    trace = metrics.start_trace("upload", attributes={"doc_id": doc_id}, file_type=".pdf")
+    ...
+    metrics.end_trace(trace)   # kept in memory, and written to METRICS_TRACE_DIR if set
+
+Serve them over HTTP with start_metrics_server(port): /metrics for Prometheus,
+/traces for the most recent traces as JSON.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        total = 0
+        result = []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class Trace:
+    """Spans recorded while handling one request, with offsets relative to its start."""
+
+    def __init__(self, name: str, labels: Dict[str, Any], attributes: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.labels = labels
+        self.attributes = attributes or {}
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.token = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, labels: Dict[str, Any]):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "offset": start - self.start,
+                "seconds": duration,
+                "labels": labels,
+                "thread": threading.current_thread().name
+            })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "labels": self.labels,
+            "attributes": self.attributes,
+            "started_at": self.started_at,
+            "seconds": self.duration,
+            "spans": sorted(self.spans, key=lambda span: span["offset"])
+        }
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and latency histograms.
+
+    Metrics are identified by name and an optional set of labels. span() times a
+    block with perf_counter into the '<name>_seconds' histogram and, if a trace is
+    active in the current context, adds it to that trace.
+    """
+
+    def __init__(self, namespace: str = "docsum", max_traces: int = 100,
+                 trace_dir: Optional[str] = None):
+        self.namespace = namespace
+        self.trace_dir = trace_dir
+        self._counters = {}
+        self._histograms = {}
+        self._traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add value to a counter."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a value in a histogram."""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def record_span(self, name: str, start: float, duration: float, **labels):
+        """Record a span timed by the caller: start is a perf_counter() value."""
+        self.observe(f"{name}_seconds", duration, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, start, duration, labels)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """Time the enclosed block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(name, start, time.perf_counter() - start, **labels)
+
+    def start_trace(self, name: str, attributes: Optional[Dict[str, Any]] = None, **labels) -> Trace:
+        """
+        Start collecting the spans of the current context into a new trace.
+
+        Labels also go on the '<name>_seconds' histogram, so keep them low-cardinality;
+        per-request details such as ids belong in attributes, which only the trace keeps.
+        """
+        trace = Trace(name, labels, attributes)
+        trace.token = _current_trace.set(trace)
+        return trace
+
+    def end_trace(self, trace: Trace) -> Dict[str, Any]:
+        """Finish a trace, keep it among the recent traces and dump it to trace_dir if set."""
+        trace.duration = time.perf_counter() - trace.start
+        try:
+            _current_trace.reset(trace.token)
+        except ValueError:
+            # Ended from a different context than it was started in
+            _current_trace.set(None)
+        self.record_span(trace.name, trace.start, trace.duration, **trace.labels)
+        data = trace.to_dict()
+        with self._lock:
+            self._traces.append(data)
+        trace_dir = self.trace_dir or os.getenv("METRICS_TRACE_DIR")
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+            path = os.path.join(trace_dir, f"{trace.name}-{int(trace.started_at)}-{trace.id}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+        return data
+
+    @contextmanager
+    def trace(self, name: str, attributes: Optional[Dict[str, Any]] = None, **labels):
+        """Collect the spans of the enclosed block into a trace."""
+        trace = self.start_trace(name, attributes, **labels)
+        try:
+            yield trace
+        finally:
+            self.end_trace(trace)
+
+    def traces(self) -> List[Dict[str, Any]]:
+        """Get the most recent traces, oldest first."""
+        with self._lock:
+            return list(self._traces)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(self._key(name, labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get every counter and histogram summary as plain data."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), "count": histogram.count,
+                           "sum": histogram.sum,
+                           "mean": histogram.sum / histogram.count if histogram.count else 0.0}
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (histogram.buckets, histogram.cumulative(), histogram.sum, histogram.count))
+                                for key, histogram in self._histograms.items())
+
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{self.namespace}_{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), (buckets, cumulative, total, count) in histograms:
+            metric = f"{self.namespace}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            for bound, bucket_count in zip(buckets, cumulative):
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {bucket_count}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Forget every recorded metric and trace."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._traces.clear()
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = Metrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = metrics.to_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/traces":
+            body = json.dumps(metrics.traces()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = 9100, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text format) and /traces (recent traces as JSON) on a background thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
@@ -0,0 +1,158 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Sequence, Tuple
+
+# Matches /v1beta/models/<model>:<method>, the path layout of the Gemini REST API
+_PATH = re.compile(r"^/[^/]+/models/([^/:]+):(generateContent|streamGenerateContent)$")
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Gemini generateContent API.
+
+    Answers with a deterministic summary of the prompt after a configurable delay,
+    so the client's pooling, retries, rate limiting and streaming can be exercised
+    and measured without network access or an API key.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0,
+                 token_latency: float = 0.0, failure_rate: float = 0.0, fail_first: Sequence[int] = ()):
+        """
+        Args:
+            latency: Seconds to wait before answering each request
+            token_latency: Seconds to wait between streamed pieces
+            failure_rate: Fraction of requests answered with 503, to exercise retries
+            fail_first: Statuses the first requests are answered with, in order
+                (e.g. [429, 503]), to exercise retries deterministically
+        """
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.failure_rate = failure_rate
+        self.fail_first = list(fail_first)
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1beta"
+
+    def respond(self, prompt: str) -> str:
+        """Build the mock answer for a prompt."""
+        words = prompt.split()
+        preview = " ".join(words[:30])
+        return f"Mock summary of {len(words)} words: {preview}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, keep-alive
+    # connections stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        match = _PATH.match(self.path.split("?", 1)[0])
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not match:
+            self._send_json(404, {"error": {"code": 404, "message": f"Unknown path {self.path}"}})
+            return
+
+        server = self.server
+        with server._lock:
+            server.requests += 1
+            if server.fail_first:
+                fail = server.fail_first.pop(0)
+            else:
+                fail = 503 if random.random() < server.failure_rate else None
+            if fail:
+                server.failures += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if fail:
+            self._send_json(fail, {"error": {"code": fail, "message": "Mock server failure"}})
+            return
+
+        try:
+            payload = json.loads(body)
+            prompt = "".join(part.get("text", "")
+                             for content in payload["contents"] for part in content["parts"])
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": {"code": 400, "message": "Malformed request"}})
+            return
+
+        text = server.respond(prompt)
+        if match.group(2) == "generateContent":
+            self._send_json(200, _candidate(text))
+        else:
+            self._stream(text)
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, text: str):
+        """Send the answer word by word as server-sent events."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = re.findall(r"\S+\s*", text)
+        for i, piece in enumerate(pieces):
+            if i and self.server.token_latency:
+                time.sleep(self.server.token_latency)
+            event = f"data: {json.dumps(_candidate(piece))}\r\n\r\n".encode("utf-8")
+            self.wfile.write(f"{len(event):X}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **kwargs) -> MockLLMServer:
+    """Start a mock server on a background thread. Port 0 picks a free port."""
+    server = MockLLMServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Gemini API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed pieces")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests failing with 503")
+    args = parser.parse_args()
+
+    server = MockLLMServer((args.host, args.port), latency=args.latency,
+                           token_latency=args.token_latency, failure_rate=args.failure_rate)
+    print(f"Mock LLM server listening on {server.base_url}")
+    print(f"Use it with SUMMARIZER_BACKEND=gemini GEMINI_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Near-duplicate detection for chunks at ingest time, using 64-bit SimHash signatures.
+
+Repeated boilerplate (running headers and footers, license text on every page)
+produces chunks that differ only in a page number or a few words. Their SimHash
+signatures are a few bits apart, so they are caught before being embedded.
+"""
+import hashlib
+from typing import Any, Dict, Optional
+import numpy as np
+from src.lexical_index import tokenize
+
+SIGNATURE_BITS = 64
+_BIT_POSITIONS = np.arange(SIGNATURE_BITS, dtype=np.uint64)
+
+
+def simhash(text: str, shingle_size: int = 3) -> Optional[int]:
+    """SimHash of the word shingles of a text, or None if it has no words."""
+    words = tokenize(text)
+    if not words:
+        return None
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 1))}
+    hashes = np.array([int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), "little")
+                       for shingle in shingles], dtype=np.uint64)
+    # Each signature bit is set when most shingle hashes have it set
+    ones = ((hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)).sum(axis=0)
+    signature = 0
+    for bit in np.flatnonzero(2 * ones > len(hashes)):
+        signature |= 1 << int(bit)
+    return signature
+
+
+class NearDuplicateFilter:
+    """
+    Remembers the signatures of the texts seen so far and recognizes texts within
+    max_distance differing bits of one of them.
+
+    Signatures are split into max_distance + 1 bands. Two signatures that close
+    share at least one whole band, so only the texts in the same band buckets are
+    compared instead of every text seen.
+    """
+
+    def __init__(self, max_distance: int = 3, shingle_size: int = 3):
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        bands = max_distance + 1
+        width = SIGNATURE_BITS // bands
+        self._bands = [(i * width, SIGNATURE_BITS - i * width if i == bands - 1 else width) for i in range(bands)]
+        self._buckets = [{} for _ in self._bands]
+        self._signatures = []
+        self._keys = []
+
+    def check(self, key: Any, text: str) -> Optional[Any]:
+        """Return the key of an earlier near-duplicate of text, or remember text under key and return None."""
+        signature = simhash(text, self.shingle_size)
+        if signature is None:
+            return None
+        band_values = [(signature >> start) & ((1 << width) - 1) for start, width in self._bands]
+        for buckets, value in zip(self._buckets, band_values):
+            for entry in buckets.get(value, ()):
+                if bin(signature ^ self._signatures[entry]).count("1") <= self.max_distance:
+                    return self._keys[entry]
+        entry = len(self._signatures)
+        self._signatures.append(signature)
+        self._keys.append(key)
+        for buckets, value in zip(self._buckets, band_values):
+            buckets.setdefault(value, []).append(entry)
+        return None
+
+
+def record_duplicate(metadata: Dict[str, Any], index: int):
+    """
+    Note in a kept chunk's metadata that the chunk at index was skipped as its near-duplicate.
+
+    Vector store metadata only holds scalars, so the skipped indexes are kept as a
+    comma-separated string next to their count.
+    """
+    duplicates = metadata["duplicates"].split(",") if metadata.get("duplicates") else []
+    duplicates.append(str(index))
+    metadata["duplicates"] = ",".join(duplicates)
+    metadata["duplicate_count"] = len(duplicates)
@@ -0,0 +1,256 @@
+"""
+The document summarization pipeline shared by the Streamlit app and the batch CLI:
+index a loaded document, retrieve the chunks to summarize, and summarize them.
+
+The *_job functions run these steps as background jobs (see src/jobs.py): they
+take a progress callback first and return JSON-serializable results.
+"""
+import os
+import tempfile
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+from src.context_packer import pack_context, token_count
+from src.document_loader import LoadedDocument, load_document
+from src.document_processor import DocumentProcessor
+from src.embedding_manager import EmbeddingManager
+from src.metrics import metrics
+from src.near_duplicates import NearDuplicateFilter, record_duplicate
+from src.rag_pipeline import Summarizer
+from src.structure import SECTION_KEYWORDS, find_sections, section_preview
+
+BASIC_QUERY = "Summarize this document."
+BASIC_CHUNKS = 5
+DETAILED_QUERY = "Provide a comprehensive and detailed summary of this document covering all key sections, main points, methodologies, findings, and conclusions."
+
+# Number of chunks retrieved for each detailed summary depth
+DEPTH_CHUNKS = {
+    "Standard": 20,
+    "Detailed": 35,
+    "Comprehensive": 50
+}
+
+# Token budget of the context packed for each detailed summary (chunks are about 1000 tokens)
+DEPTH_TOKEN_BUDGETS = {
+    "Standard": 12000,
+    "Detailed": 20000,
+    "Comprehensive": 32000
+}
+
+
+def index_document(document: LoadedDocument, doc_id: str, processor: DocumentProcessor,
+                   embed_manager: EmbeddingManager, deduplicate: bool = True) -> int:
+    """
+    Chunk and embed a document into its namespace unless it is indexed already. Returns the chunk count.
+
+    With deduplicate, chunks that are near-duplicates of an earlier chunk (repeated
+    headers, footers, boilerplate) are not embedded; the kept chunk lists their
+    indexes in its 'duplicates' metadata.
+    """
+    if embed_manager.has_document(doc_id):
+        # Already indexed (by this or another session), reuse it as is
+        return embed_manager.document_chunk_count(doc_id)
+
+    chunk_docs = []
+    tokens = 0
+    skipped = 0
+    duplicates = NearDuplicateFilter() if deduplicate else None
+    with metrics.span("chunk"):
+        for i, chunk in enumerate(processor.iter_document_chunks(document.iter_text())):
+            original = duplicates.check(len(chunk_docs), chunk['text']) if duplicates else None
+            if original is not None:
+                record_duplicate(chunk_docs[original]['metadata'], i)
+                skipped += 1
+                continue
+            chunk_docs.append({
+                "chunk_id": f"{doc_id}_{i}",
+                "text": chunk['text'],
+                "metadata": {"source": "uploaded_document", "doc_id": doc_id, "index": i,
+                             **processor.offset_metadata(chunk)}
+            })
+            tokens += chunk['token_count']
+    metrics.inc("chunks_indexed", len(chunk_docs))
+    metrics.inc("chunks_deduplicated", skipped)
+    metrics.inc("tokens_indexed", tokens)
+    with metrics.span("index"):
+        embed_manager.add_document(doc_id, chunk_docs)
+    return len(chunk_docs)
+
+
+def retrieve_basic(embed_manager: EmbeddingManager, doc_id: str,
+                   token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Retrieve the BASIC_CHUNKS chunks the basic summary is built from, minus
+    near-duplicates, optionally packed into token_budget.
+    """
+    retrieved = embed_manager.search(BASIC_QUERY, n_results=BASIC_CHUNKS, doc_id=doc_id, include_embeddings=True)
+    return pack_context(retrieved, token_budget)
+
+
+def retrieve_detailed(embed_manager: EmbeddingManager, doc_id: str, chunk_count: int,
+                      token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Retrieve the chunks the detailed summary is built from: the chunk_count best
+    matches for the detailed query followed by the best two for every section keyword,
+    packed into token_budget (see DEPTH_TOKEN_BUDGETS) and put in document order.
+    """
+    query_embedding = embed_manager.embed_queries([DETAILED_QUERY])[0]
+    detailed_retrieved = embed_manager.search(DETAILED_QUERY, n_results=chunk_count, doc_id=doc_id,
+                                              include_embeddings=True, query_embedding=query_embedding)
+    section_items = section_chunks(embed_manager, doc_id)
+    if not section_items:
+        # No section labels (indexed without structure-aware chunking, or no headings
+        # found): the section lookups become keyword matches in the lexical index
+        section_retrieved = embed_manager.lexical_search_many(SECTION_KEYWORDS, n_results=2, doc_id=doc_id,
+                                                              include_embeddings=True)
+        section_items = [item for results in section_retrieved for item in results]
+
+    # Combine regular detailed chunks with section-specific chunks
+    # Remove duplicates while preserving order
+    items = []
+    seen = set()
+    for item in detailed_retrieved + section_items:
+        if item['text'] not in seen:
+            items.append(item)
+            seen.add(item['text'])
+    # Section and keyword matches carry no distance to the detailed query, so every
+    # item is scored against the query embedding instead
+    return pack_context(items, token_budget, query_embedding=query_embedding)
+
+
+def section_chunks(embed_manager: EmbeddingManager, doc_id: str, per_section: int = 2) -> List[Dict[str, Any]]:
+    """
+    The first per_section chunks of every section whose heading names one of
+    SECTION_KEYWORDS, fetched with one metadata-filtered lookup.
+    """
+    chunks = embed_manager.get_chunks(doc_id, where={"section_type": {"$in": SECTION_KEYWORDS}},
+                                      include_embeddings=True)
+    taken = {}
+    items = []
+    for chunk in chunks:
+        section = (chunk['metadata']['section_type'], chunk['metadata']['section'])
+        if taken.get(section, 0) < per_section:
+            taken[section] = taken.get(section, 0) + 1
+            items.append(chunk)
+    return items
+
+
+def document_outline(embed_manager: EmbeddingManager, doc_id: str, text: str,
+                     max_sections: int = 15) -> List[Dict[str, str]]:
+    """
+    The section headings of a document with a short preview of each.
+
+    Taken from the section labels stored with the chunks, so the text is not
+    scanned again; documents indexed without them fall back to scanning text.
+    """
+    chunks = embed_manager.get_chunks(doc_id)
+    if not any('section' in (chunk['metadata'] or {}) for chunk in chunks):
+        return find_sections(text, max_sections)
+    outline = []
+    previous = None
+    for chunk in chunks:
+        heading = chunk['metadata']['section']
+        if heading and heading != previous:
+            # A section's first chunk starts at its heading line
+            outline.append({"heading": heading, "preview": section_preview(chunk['text'].split('\n')[1:6])})
+            if len(outline) >= max_sections:
+                break
+        previous = heading
+    return outline
+
+
+def iter_basic_summary(summarizer: Summarizer, doc_id: str, retrieved: List[Dict[str, Any]]) -> Iterator[str]:
+    """Stream the basic summary of the retrieved chunks."""
+    return summarizer.iter_summary([item['text'] for item in retrieved], prompt=BASIC_QUERY, doc_id=doc_id,
+                                   chunk_ids=[item['id'] for item in retrieved], depth="basic")
+
+
+def iter_detailed_summary(summarizer: Summarizer, doc_id: str, retrieved: List[Dict[str, Any]],
+                          depth: str) -> Iterator[str]:
+    """Stream the detailed summary of the retrieved chunks."""
+    return summarizer.iter_summary([item['text'] for item in retrieved], prompt=DETAILED_QUERY, doc_id=doc_id,
+                                   chunk_ids=[item['id'] for item in retrieved], depth=depth)
+
+
+def iter_page_summaries(summarizer: Summarizer, doc_id: str,
+                        document: LoadedDocument) -> Tuple[List[int], Iterator[Tuple[int, str]]]:
+    """
+    Summarize the non-empty pages of a document concurrently.
+
+    Returns the page numbers that are summarized and an iterator of
+    (position in that list, summary) pairs in completion order.
+    """
+    pages = [(page_num, page_text) for page_num, page_text in document.iter_pages()
+             if len(page_text.strip()) > 100]
+    summaries = summarizer.iter_summaries(
+        [[page_text] for _, page_text in pages],
+        [f"Summarize page {page_num} of this document." for page_num, _ in pages],
+        doc_id=doc_id,
+        chunk_ids=[[f"page_{page_num}"] for page_num, _ in pages],
+        depth="page"
+    )
+    return [page_num for page_num, _ in pages], summaries
+
+
+def ingest_job(progress: Callable[..., None], content: bytes, file_type: str, doc_id: str,
+               processor: DocumentProcessor, embed_manager: EmbeddingManager) -> Dict[str, Any]:
+    """
+    Job: extract and index an uploaded file. Returns its doc_id, page count, file
+    type and chunk count; the page texts are kept with the index (see load_indexed_document).
+    """
+    progress(0.0, "Extracting text")
+    with tempfile.NamedTemporaryFile(delete=False, suffix=file_type) as tmp_file:
+        tmp_file.write(content)
+        tmp_file_path = tmp_file.name
+    try:
+        document = load_document(tmp_file_path)
+    finally:
+        os.unlink(tmp_file_path)
+    progress(0.3, "Chunking and embedding")
+    chunk_count = index_document(document, doc_id, processor, embed_manager)
+    embed_manager.save_pages(doc_id, document.pages, document.file_type)
+    return {"doc_id": doc_id, "page_count": len(document.pages), "file_type": document.file_type,
+            "chunk_count": chunk_count}
+
+
+def load_indexed_document(embed_manager: EmbeddingManager, doc_id: str) -> Optional[LoadedDocument]:
+    """The pages of a document stored by ingest_job, or None if they are gone (evicted with its index)."""
+    stored = embed_manager.load_pages(doc_id)
+    return LoadedDocument(stored["pages"], stored["file_type"]) if stored is not None else None
+
+
+def _summary_job(progress: Callable[..., None], retrieved: List[Dict[str, Any]],
+                 pieces: Iterator[str]) -> Dict[str, Any]:
+    summary = ""
+    progress(0.2, "Summarizing")
+    for piece in pieces:
+        summary += piece
+        progress(0.5, "Summarizing", partial=summary)
+    return {"summary": summary.strip(), "chunks": [item['text'] for item in retrieved],
+            "tokens": sum(token_count(item) for item in retrieved)}
+
+
+def basic_summary_job(progress: Callable[..., None], embed_manager: EmbeddingManager, summarizer: Summarizer,
+                      doc_id: str) -> Dict[str, Any]:
+    """Job: the basic summary of an indexed document, streamed into the job's partial result."""
+    progress(0.0, "Retrieving chunks")
+    retrieved = retrieve_basic(embed_manager, doc_id)
+    return _summary_job(progress, retrieved, iter_basic_summary(summarizer, doc_id, retrieved))
+
+
+def detailed_summary_job(progress: Callable[..., None], embed_manager: EmbeddingManager, summarizer: Summarizer,
+                         doc_id: str, chunk_count: int, depth: str) -> Dict[str, Any]:
+    """Job: the detailed summary of an indexed document at a depth, streamed into the job's partial result."""
+    progress(0.0, "Retrieving chunks")
+    retrieved = retrieve_detailed(embed_manager, doc_id, chunk_count, token_budget=DEPTH_TOKEN_BUDGETS[depth])
+    return _summary_job(progress, retrieved, iter_detailed_summary(summarizer, doc_id, retrieved, depth))
+
+
+def page_summaries_job(progress: Callable[..., None], summarizer: Summarizer, doc_id: str,
+                       pages: List[str], file_type: str) -> Dict[str, Any]:
+    """Job: page-by-page summaries; the partial result lists the [page, summary] pairs done so far."""
+    page_nums, summaries = iter_page_summaries(summarizer, doc_id, LoadedDocument(pages, file_type))
+    done = {}
+    for i, page_summary in summaries:
+        done[i] = page_summary
+        progress(len(done) / len(page_nums), f"{len(done)}/{len(page_nums)} pages",
+                 partial=[[page_nums[j], done[j]] for j in sorted(done)])
+    return {"pages": [[page_num, done[i]] for i, page_num in enumerate(page_nums)]}
@@ -1,139 +1,275 @@
+import contextvars
+import hashlib
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from typing import List
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from src.llm_client import LLMClient, create_llm_client
+from src.metrics import metrics
+from src.summary_cache import SummaryCache
+from src.text_scanner import scan_chunks
 
 # Load environment variables
 load_dotenv()
 
+# Bump whenever summary generation changes, so cached summaries are not reused
+SUMMARIZER_VERSION = "1"
+
 class Summarizer:
     """
     A class for generating summaries of text using a language model.
+    
+    Long inputs are summarized map-reduce style: chunks are grouped into sections,
+    the sections are summarized concurrently, and the section summaries are reduced
+    again, level by level, until they fit into one final synthesis.
     """
     
-    def __init__(self):
-        """Initialize the Summarizer."""
+    def __init__(self, max_concurrency: int = 4, section_size: int = 20,
+                 llm_client: Optional[LLMClient] = None, cache: Optional[SummaryCache] = None,
+                 backend: Optional[str] = None):
+        """
+        Initialize the Summarizer.
+        
+        Args:
+            max_concurrency: Maximum number of section summaries generated at the same time
+            section_size: Maximum number of chunks (or summaries) summarized in one call
+            llm_client: Language model used to write summaries. Defaults to the backend
+                selected by SUMMARIZER_BACKEND; without one, keyword heuristics are used
+            cache: Cache of generated summaries. Without one, every call generates anew
+            backend: Backend used when no llm_client is given, overriding SUMMARIZER_BACKEND;
+                "heuristic" forces the keyword heuristics
+        """
         self.api_key = os.getenv("GEMINI_API_KEY")
+        self.llm_client = llm_client if llm_client is not None else create_llm_client(backend)
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.section_size = section_size
+        # Bounds concurrent summary calls across all threads using this summarizer
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._local = threading.local()
+    
+    @property
+    def last_timings(self) -> List[Dict[str, Any]]:
+        """Per-section timings of the last generate_summary call made from this thread."""
+        return getattr(self._local, "timings", [])
+        
+    @property
+    def version(self) -> str:
+        """Identifies how summaries are generated: the summarizer version and its backend."""
+        if self.llm_client is None:
+            backend = "heuristic"
+        else:
+            backend = f"{type(self.llm_client).__name__}:{getattr(self.llm_client, 'model', '')}"
+        return f"{SUMMARIZER_VERSION}/{backend}/{self.section_size}"
         
-    def generate_summary(self, context_chunks: List[str], prompt: str = "Summarize this document.") -> str:
+    def generate_summary(self, context_chunks: List[str], prompt: str = "Summarize this document.",
+                         doc_id: str = "", chunk_ids: Optional[List[str]] = None, depth: str = "") -> str:
         """
         Generate a summary from the provided text chunks.
         
         Args:
             context_chunks: List of text chunks to summarize
             prompt: The prompt to use for summarization
+            doc_id: Content hash of the document the chunks come from, for the cache key
+            chunk_ids: Ids of the chunks, for the cache key. Defaults to a hash of their text
+            depth: Summary depth setting, for the cache key
             
         Returns:
             A string containing the generated summary
         """
-        # Check if we have too many chunks, and if so, divide and conquer
-        if len(context_chunks) > 20:
-            # For very large documents, we'll summarize in sections then combine
-            max_chunks_per_section = 20
-            section_summaries = []
+        return "".join(self.iter_summary(context_chunks, prompt, doc_id, chunk_ids, depth)).strip()
+    
+    def iter_summary(self, context_chunks: List[str], prompt: str = "Summarize this document.",
+                     doc_id: str = "", chunk_ids: Optional[List[str]] = None, depth: str = "") -> Iterator[str]:
+        """
+        Generate a summary like generate_summary, yielding it piece by piece as it is produced.
+        
+        Section summaries of long inputs are computed first; the final synthesis is then
+        streamed, token by token from an LLM backend or section by section from the
+        heuristic one. A cached summary is yielded in one piece.
+        
+        Args:
+            context_chunks: List of text chunks to summarize
+            prompt: The prompt to use for summarization
+            doc_id: Content hash of the document the chunks come from, for the cache key
+            chunk_ids: Ids of the chunks, for the cache key. Defaults to a hash of their text
+            depth: Summary depth setting, for the cache key
             
-            # Process chunks in batches
-            for i in range(0, len(context_chunks), max_chunks_per_section):
-                batch = context_chunks[i:i+max_chunks_per_section]
+        Yields:
+            Consecutive pieces of the summary
+        """
+        key = None
+        if self.cache is not None:
+            if chunk_ids is None:
+                chunk_ids = [hashlib.sha256(chunk.encode('utf-8')).hexdigest() for chunk in context_chunks]
+            key = self.cache.make_key(doc_id, chunk_ids, prompt, depth, self.version)
+            summary = self.cache.get(key)
+            if summary is not None:
+                metrics.inc("summary_cache_hits")
+                self._local.timings = []
+                yield summary
+                return
+            metrics.inc("summary_cache_misses")
+        
+        pieces = []
+        for piece in self._iter_summary(context_chunks, prompt):
+            pieces.append(piece)
+            yield piece
+        if key is not None:
+            self.cache.put(key, "".join(pieces).strip())
+    
+    def _iter_summary(self, context_chunks: List[str], prompt: str) -> Iterator[str]:
+        timings = []
+        self._local.timings = timings
+        
+        # Check if we have too many chunks, and if so, divide and conquer
+        if len(context_chunks) > self.section_size:
+            # For very large documents, we'll summarize in sections then combine,
+            # reducing the section summaries again until they fit in one call
+            summaries = context_chunks
+            level = 0
+            while len(summaries) > self.section_size:
+                batches = [summaries[i:i + self.section_size]
+                           for i in range(0, len(summaries), self.section_size)]
                 section_prompt = f"Summarize this section of the document."
-                section_summaries.append(self._generate_summary_for_chunks(batch, section_prompt))
+                summaries = self._map_sections(batches, section_prompt, level, timings)
+                level += 1
             
             # Now create a final summary from the section summaries
             final_prompt = f"{prompt} This is the final synthesis of all document sections."
-            return self._generate_summary_for_chunks(section_summaries, final_prompt)
+            yield from self._timed_stream(summaries, final_prompt, timings, level=level, section=0)
         else:
             # For smaller documents, process directly
-            return self._generate_summary_for_chunks(context_chunks, prompt)
+            yield from self._timed_stream(context_chunks, prompt, timings, level=0, section=0)
+    
+    def summarize_many(self, chunk_groups: List[List[str]], prompts: List[str], doc_id: str = "",
+                       chunk_ids: Optional[List[List[str]]] = None, depth: str = "") -> List[str]:
+        """
+        Summarize several independent inputs (e.g. the pages of a document) concurrently.
+        
+        Returns the summaries in the same order as the inputs.
+        """
+        summaries = [None] * len(chunk_groups)
+        for i, summary in self.iter_summaries(chunk_groups, prompts, doc_id, chunk_ids, depth):
+            summaries[i] = summary
+        return summaries
+    
+    def iter_summaries(self, chunk_groups: List[List[str]], prompts: List[str], doc_id: str = "",
+                       chunk_ids: Optional[List[List[str]]] = None, depth: str = "") -> Iterator[Tuple[int, str]]:
+        """
+        Summarize several independent inputs concurrently, yielding each summary as soon as it is done.
+        
+        Yields:
+            (index of the input, summary) pairs in completion order
+        """
+        if not chunk_groups:
+            return
+        if chunk_ids is None:
+            chunk_ids = [None] * len(chunk_groups)
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunk_groups))) as executor:
+            futures = {
+                # Run in a copy of the caller's context, so the work shows up in its trace
+                executor.submit(contextvars.copy_context().run, self.generate_summary,
+                                chunks, prompt, doc_id, ids, depth): i
+                for i, (chunks, prompt, ids) in enumerate(zip(chunk_groups, prompts, chunk_ids))
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    
+    def _map_sections(self, batches: List[List[str]], prompt: str, level: int,
+                      timings: List[Dict[str, Any]]) -> List[str]:
+        """Summarize the batches of one reduce level concurrently, keeping their order."""
+        if len(batches) == 1:
+            return [self._timed_summary(batches[0], prompt, timings, level=level, section=0)]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, self._timed_summary,
+                                       batch, prompt, timings, level, section)
+                       for section, batch in enumerate(batches)]
+            return [future.result() for future in futures]
+    
+    def _timed_summary(self, chunks: List[str], prompt: str, timings: List[Dict[str, Any]],
+                       level: int, section: int) -> str:
+        with self._slots:
+            start = time.perf_counter()
+            summary = self._generate_summary_for_chunks(chunks, prompt)
+            seconds = time.perf_counter() - start
+            timings.append({
+                "level": level,
+                "section": section,
+                "chunks": len(chunks),
+                "seconds": seconds
+            })
+        metrics.record_span("summarize", start, seconds, stage="section")
+        return summary
+    
+    def _timed_stream(self, chunks: List[str], prompt: str, timings: List[Dict[str, Any]],
+                      level: int, section: int) -> Iterator[str]:
+        with self._slots:
+            start = time.perf_counter()
+            first_piece = None
+            for piece in self._stream_summary_for_chunks(chunks, prompt):
+                if first_piece is None:
+                    first_piece = time.perf_counter() - start
+                yield piece
+            seconds = time.perf_counter() - start
+            timings.append({
+                "level": level,
+                "section": section,
+                "chunks": len(chunks),
+                "seconds": seconds,
+                "first_piece_seconds": first_piece
+            })
+        metrics.record_span("summarize", start, seconds, stage="final")
+        if first_piece is not None:
+            metrics.observe("summary_first_piece_seconds", first_piece)
+    
+    def _stream_summary_for_chunks(self, chunks: List[str], prompt: str) -> Iterator[str]:
+        """Yield the summary of a batch of chunks in pieces: LLM tokens, or heuristic sections."""
+        if chunks and self.llm_client is not None:
+            yield from self.llm_client.stream(self._build_prompt(chunks, prompt))
+            return
+        # Heuristic summaries are built at once; hand them out paragraph by paragraph
+        summary = self._generate_summary_for_chunks(chunks, prompt)
+        for piece in re.split(r"(?=\n\n|\n#)", summary):
+            if piece:
+                yield piece
+    
+    @staticmethod
+    def _build_prompt(chunks: List[str], prompt: str) -> str:
+        """Combine the instruction and the numbered chunks into one model prompt."""
+        parts = [prompt, ""]
+        for i, chunk in enumerate(chunks):
+            parts.append(f"[{i + 1}]\n{chunk.strip()}\n")
+        return "\n".join(parts)
     
     def _generate_summary_for_chunks(self, chunks: List[str], prompt: str) -> str:
         """Internal method to generate summaries for a batch of chunks"""
-        # Simple concatenation of chunks for testing
-        combined_text = " ".join(chunks)
-        
         # For now, return a simple summary
         if not chunks:
             return "No content provided for summarization."
         
-        # Count words to simulate a real summary
-        word_count = len(combined_text.split())
-        
-        # Extract some keywords from the text to make the summary more realistic
-        keywords = []
-        if "RAG" in combined_text or "retrieval" in combined_text.lower():
-            keywords.append("Retrieval Augmented Generation (RAG)")
-        if "embedding" in combined_text.lower() or "vector" in combined_text.lower():
-            keywords.append("vector embeddings")
-        if "language model" in combined_text.lower() or "LLM" in combined_text.upper():
-            keywords.append("large language models")
-        if "neural" in combined_text.lower() or "network" in combined_text.lower():
-            keywords.append("neural networks")
-        if "machine learning" in combined_text.lower() or "ML" in combined_text.upper():
-            keywords.append("machine learning")
-        if "data" in combined_text.lower() and "analysis" in combined_text.lower():
-            keywords.append("data analysis")
-        if "algorithm" in combined_text.lower():
-            keywords.append("algorithms")
-        if "research" in combined_text.lower():
-            keywords.append("research methodology")
+        if self.llm_client is not None:
+            return self.llm_client.generate(self._build_prompt(chunks, prompt)).strip()
         
-        # If no specific keywords were found, use generic ones
-        if not keywords:
-            keywords = ["scientific research", "technical content", "academic material"]
+        # Check if this is a detailed/comprehensive query
+        detailed = "detailed" in prompt.lower() or "comprehensive" in prompt.lower() or "all key sections" in prompt.lower()
+        
+        # One pass over the chunks collects keywords, section headers and key findings
+        scan = scan_chunks(chunks, collect_details=detailed)
+        word_count = scan["word_count"]
         
+        # If no specific keywords were found, use generic ones
+        keywords = scan["keywords"] or ["scientific research", "technical content", "academic material"]
         keyword_text = ", ".join(keywords)
+        title = scan["title"]
         
-        # Try to extract a title or main topic
-        title = "unknown topic"
-        lines = combined_text.split('\n')
-        for line in lines[:10]:  # Check first 10 lines for potential title
-            if len(line.strip()) > 10 and len(line.strip()) < 100:  # Typical title length
-                title = line.strip()
-                break
-          # Check if this is a detailed/comprehensive query
-        if "detailed" in prompt.lower() or "comprehensive" in prompt.lower() or "all key sections" in prompt.lower():
-            # Adjust summary depth based on context size
-            detail_level = "high" if len(chunks) > 30 else "medium" if len(chunks) > 15 else "standard"
-            
-            # For detailed summaries, we'll try to extract more specific content from the text chunks
-            
-            # Try to identify document type (academic paper, technical report, etc.)
-            doc_type = "technical document"
-            if "abstract" in combined_text.lower() and "references" in combined_text.lower():
-                doc_type = "academic paper"
-            elif "executive summary" in combined_text.lower():
-                doc_type = "technical report"
-            elif "chapter" in combined_text.lower():
-                doc_type = "book or thesis"
-            
-            # Extract section information by looking for common section headers
-            sections = {}
-            section_headers = ["abstract", "introduction", "background", "methodology", 
-                            "results", "discussion", "conclusion", "references"]
-            
-            for header in section_headers:
-                # Look for sections in the text
-                for chunk in chunks:
-                    lines = chunk.split('\n')
-                    for i, line in enumerate(lines):
-                        if header.lower() in line.lower() and len(line) < 50:
-                            # Found a potential section header, extract content
-                            content = "\n".join(lines[i+1:i+6])  # Get a few lines after the header
-                            if header not in sections:
-                                sections[header] = content[:300]  # Limit to 300 chars
-              # Identify key findings
-            findings = []
-            finding_indicators = ["found that", "results show", "conclude", "demonstrates", "reveals", 
-                                 "key finding", "important result", "significant", "critical", "essential"]
-            for indicator in finding_indicators:
-                for chunk in chunks:
-                    if indicator in chunk.lower():
-                        # Extract sentences containing finding indicators
-                        sentences = chunk.split('.')
-                        for sentence in sentences:
-                            if indicator in sentence.lower():
-                                findings.append(sentence.strip())
-                                
-            # Limit findings to top 5
-            findings = findings[:5]
+        if detailed:
+            doc_type = scan["doc_type"]
+            sections = scan["sections"]
+            findings = scan["findings"]
             
             # Build a comprehensive and detailed summary
             summary = f"""
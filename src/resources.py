@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class ResourceRegistry:
+    """
+    Thread-safe, process-wide registry of lazily created resources.
+
+    Each resource is built by its factory the first time it is requested and
+    shared afterwards. Loads of different resources do not block each other.
+    """
+
+    def __init__(self):
+        self._resources = {}
+        self._metrics = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the resource for key, creating it with factory on first use."""
+        try:
+            resource = self._resources[key]
+        except KeyError:
+            pass
+        else:
+            self._metrics[key]["hits"] += 1
+            return resource
+
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key in self._resources:
+                self._metrics[key]["hits"] += 1
+                return self._resources[key]
+            start = time.perf_counter()
+            resource = factory()
+            self._metrics[key] = {
+                "load_seconds": time.perf_counter() - start,
+                "loaded_at": time.time(),
+                "hits": 0
+            }
+            self._resources[key] = resource
+            return resource
+
+    def is_loaded(self, key: Hashable) -> bool:
+        return key in self._resources
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Get load time, load timestamp and reuse count for every loaded resource."""
+        return {str(key): dict(values) for key, values in self._metrics.items()}
+
+    def clear(self):
+        """Forget every resource, so the next request loads it again."""
+        with self._lock:
+            self._resources.clear()
+            self._metrics.clear()
+            self._locks.clear()
+
+
+registry = ResourceRegistry()
+
+
+def get_tokenizer(name: str = "cl100k_base"):
+    """Get the shared tiktoken encoding."""
+    def load():
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    return registry.get(("tokenizer", name), load)
+
+
+def get_sentence_transformer(model_name: str, device: Optional[str] = None):
+    """Get the shared SentenceTransformer model."""
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device=device)
+    return registry.get(("sentence_transformer", model_name, device), load)
+
+
+def get_chroma_client(path: Optional[str] = None):
+    """Get the shared Chroma client, persistent if a path is given."""
+    def load():
+        import chromadb
+        from chromadb.config import Settings
+        settings = Settings(anonymized_telemetry=False)
+        if path:
+            return chromadb.PersistentClient(path=path, settings=settings)
+        return chromadb.Client(settings)
+    return registry.get(("chroma_client", path), load)
@@ -0,0 +1,426 @@
+"""
+HTTP service exposing ingest, search and summarize over the same pipeline as
+the Streamlit app, for other services to call programmatically.
+
+A plain ASGI application, served with uvicorn:
+
+    python -m src.service --port 8000
+    uvicorn src.service:create_app --factory --port 8000
+
+Endpoints (JSON in and out):
+    GET  /healthz         liveness: the process is serving requests
+    GET  /readyz          readiness: 503 until the embedding model is loaded
+    POST /ingest          index a document: the raw file as the body (type from ?file_type=
+                          or Content-Type), or {"text": ..., "file_type": ".txt"}
+    POST /search          {"query", "doc_id", "n_results": 5, "mode": "dense" | "hybrid" | "lexical"}
+    POST /summarize       {"doc_id", "depth": "basic" | "Standard" | "Detailed" | "Comprehensive"}
+    GET  /jobs/<job_id>   state of an ingest or summarize request sent with "wait": false
+
+Concurrent searches are collected for a few milliseconds and answered with one
+encoder call (see SearchBatcher). Ingest and summarize run on a JobQueue with
+the same job keys as the app, so identical requests are computed once.
+"""
+import argparse
+import asyncio
+import functools
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+import numpy as np
+from src.document_processor import DocumentProcessor
+from src.embedding_manager import EmbeddingManager
+from src.jobs import ACTIVE_STATUSES, DONE, JobQueue
+from src.metrics import metrics, start_metrics_server
+from src.pipeline import (BASIC_QUERY, DEPTH_CHUNKS, DETAILED_QUERY, basic_summary_job, detailed_summary_job,
+                          ingest_job)
+from src.rag_pipeline import Summarizer
+from src.summary_cache import SummaryCache
+
+SEARCH_MODES = ("dense", "hybrid", "lexical")
+MAX_RESULTS = 100
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+_FILE_TYPES = {"application/pdf": ".pdf", "text/plain": ".txt", "text/markdown": ".md"}
+
+
+class HTTPError(Exception):
+    """An error answered with its status code and message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SearchBatcher:
+    """
+    Collects concurrent search requests and answers them together, so a burst of
+    requests costs one encoder call instead of one each.
+
+    A batch is sent when max_batch_size requests are waiting, or max_wait seconds
+    after its first request arrived. Its distinct queries are encoded in one call,
+    and dense searches of the same document share one vector store query.
+    """
+
+    def __init__(self, embed_manager: EmbeddingManager, max_batch_size: int = 64, max_wait: float = 0.005):
+        self.embed_manager = embed_manager
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+
+    async def search(self, query: str, n_results: int = 5, doc_id: Optional[str] = None,
+                     mode: str = "dense") -> List[Dict[str, Any]]:
+        """Dense or hybrid search, answered with the next batch."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((query, n_results, doc_id, mode), future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Tuple[str, int, Optional[str], str], asyncio.Future]]):
+        try:
+            results = await _blocking(self.search_batch, [request for request, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            # Requests whose client went away are cancelled already
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def search_batch(self, requests: List[Tuple[str, int, Optional[str], str]]) -> List[List[Dict[str, Any]]]:
+        """Answer (query, n_results, doc_id, mode) requests with one encoder call."""
+        metrics.inc("search_batches")
+        metrics.inc("search_batched_requests", len(requests))
+        with metrics.span("search_batch"):
+            queries = list(dict.fromkeys(query for query, _, _, _ in requests))
+            embeddings = dict(zip(queries, self.embed_manager.embed_queries(queries)))
+
+            results = [None] * len(requests)
+            dense = {}
+            for i, (query, n_results, doc_id, mode) in enumerate(requests):
+                if mode == "hybrid":
+                    results[i] = self.embed_manager.hybrid_search(query, n_results=n_results, doc_id=doc_id,
+                                                                  query_embedding=embeddings[query])
+                else:
+                    dense.setdefault(doc_id, []).append(i)
+            for doc_id, rows in dense.items():
+                found = self.embed_manager.search_many(
+                    [requests[i][0] for i in rows], n_results=[requests[i][1] for i in rows], doc_id=doc_id,
+                    query_embeddings=np.stack([embeddings[requests[i][0]] for i in rows])
+                )
+                for i, items in zip(rows, found):
+                    results[i] = items
+        return results
+
+
+class SummarizationService:
+    """
+    ASGI application serving the pipeline over HTTP.
+
+    Blocking work runs off the event loop: searches on the default executor
+    through the SearchBatcher, ingest and summaries on the JobQueue.
+    """
+
+    def __init__(self, processor: DocumentProcessor, embed_manager: EmbeddingManager, summarizer: Summarizer,
+                 jobs: JobQueue, max_batch_size: int = 64, max_wait: float = 0.005,
+                 poll_interval: float = 0.05, max_body_bytes: int = MAX_BODY_BYTES):
+        self.processor = processor
+        self.embed_manager = embed_manager
+        self.summarizer = summarizer
+        self.jobs = jobs
+        self.batcher = SearchBatcher(embed_manager, max_batch_size=max_batch_size, max_wait=max_wait)
+        self.poll_interval = poll_interval
+        self.max_body_bytes = max_body_bytes
+        self.ready = False
+        self.startup_error = None
+        self._routes = {
+            "/healthz": ("GET", self.health),
+            "/readyz": ("GET", self.readiness),
+            "/ingest": ("POST", self.ingest),
+            "/search": ("POST", self.search),
+            "/summarize": ("POST", self.summarize),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def warm_up(self):
+        """Load the embedding model and encode the summary queries, then report ready."""
+        try:
+            await _blocking(self.embed_manager.precompute_queries, [BASIC_QUERY, DETAILED_QUERY])
+        except Exception as e:
+            self.startup_error = f"{type(e).__name__}: {e}"
+        else:
+            self.ready = True
+
+    async def health(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        return 200, {"status": "ok"}
+
+    async def readiness(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if self.ready:
+            return 200, {"status": "ready"}
+        if self.startup_error is not None:
+            return 503, {"status": "failed", "error": self.startup_error}
+        return 503, {"status": "loading"}
+
+    async def ingest(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if request["content_type"] == "application/json":
+            body = _json_body(request)
+            text = body.get("text")
+            if not isinstance(text, str) or not text.strip():
+                raise HTTPError(400, "'text' must be a non-empty string")
+            content = text.encode('utf-8')
+            file_type = body.get("file_type", ".txt")
+            wait = body.get("wait", True)
+        else:
+            content = request["body"]
+            file_type = request["query"].get("file_type") or _FILE_TYPES.get(request["content_type"])
+            wait = request["query"].get("wait", "true").lower() != "false"
+        if not content:
+            raise HTTPError(400, "Empty document")
+        if file_type not in (".pdf", ".txt", ".md"):
+            raise HTTPError(415, "Send a PDF, TXT or Markdown document (file_type .pdf, .txt or .md)")
+
+        doc_id, job_id = await _blocking(self._submit_ingest, content, file_type)
+        return await self._job_response(job_id, wait, failed_status=422, doc_id=doc_id)
+
+    async def search(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        body = _json_body(request)
+        query = body.get("query")
+        doc_id = body.get("doc_id")
+        n_results = body.get("n_results", 5)
+        mode = body.get("mode", "dense")
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "'query' must be a non-empty string")
+        if isinstance(n_results, bool) or not isinstance(n_results, int) or not 1 <= n_results <= MAX_RESULTS:
+            raise HTTPError(400, f"'n_results' must be an integer from 1 to {MAX_RESULTS}")
+        if mode not in SEARCH_MODES:
+            raise HTTPError(400, f"'mode' must be one of {', '.join(SEARCH_MODES)}")
+        if doc_id is not None:
+            await _blocking(self._check_document, doc_id)
+
+        if mode == "lexical":
+            results = await _blocking(self.embed_manager.lexical_search, query, n_results=n_results, doc_id=doc_id)
+        else:
+            results = await self.batcher.search(query, n_results=n_results, doc_id=doc_id, mode=mode)
+        return 200, {"results": [_search_result(item) for item in results]}
+
+    async def summarize(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        body = _json_body(request)
+        doc_id = body.get("doc_id")
+        depth = body.get("depth", "basic")
+        if not isinstance(doc_id, str):
+            raise HTTPError(400, "'doc_id' must be the id returned by /ingest")
+        if depth != "basic" and depth not in DEPTH_CHUNKS:
+            raise HTTPError(400, f"'depth' must be one of basic, {', '.join(DEPTH_CHUNKS)}")
+        job_id = await _blocking(self._submit_summary, doc_id, depth)
+        return await self._job_response(job_id, body.get("wait", True), failed_status=500,
+                                        doc_id=doc_id, depth=depth)
+
+    async def job(self, job_id: str) -> Tuple[int, Dict[str, Any]]:
+        job = await _blocking(self.jobs.get, job_id)
+        if job is None:
+            raise HTTPError(404, f"Unknown job {job_id}")
+        return 200, _job_view(job)
+
+    async def _job_response(self, job_id: str, wait: bool, failed_status: int,
+                            **fields) -> Tuple[int, Dict[str, Any]]:
+        """Wait for a job without blocking the event loop (unless wait is false) and answer with its state."""
+        job = await _blocking(self.jobs.get, job_id)
+        while wait and job["status"] in ACTIVE_STATUSES:
+            await asyncio.sleep(self.poll_interval)
+            job = await _blocking(self.jobs.get, job_id)
+        if job["status"] in ACTIVE_STATUSES:
+            return 202, {**fields, **_job_view(job)}
+        return (200 if job["status"] == DONE else failed_status), {**fields, **_job_view(job)}
+
+    def _submit_ingest(self, content: bytes, file_type: str) -> Tuple[str, str]:
+        """Submit the ingest job of a document. Returns its doc_id and the job id."""
+        doc_id = self.embed_manager.document_id(content)
+        processor = self.processor
+        key = f"{doc_id}|{processor.chunk_size}|{processor.chunk_overlap}|{processor.structure_aware}"
+        if not self.embed_manager.has_document(doc_id) or not self.embed_manager.has_pages(doc_id):
+            # Evicted since it was indexed: a finished ingest job no longer holds
+            self.jobs.discard(JobQueue.job_id("ingest", key))
+        job_id = self.jobs.submit("ingest", key, ingest_job, content, file_type, doc_id, processor,
+                                  self.embed_manager)
+        return doc_id, job_id
+
+    def _submit_summary(self, doc_id: str, depth: str) -> str:
+        """Submit the summary job of an indexed document, keyed like the app's. Returns the job id."""
+        self._check_document(doc_id)
+        version = self.summarizer.version
+        if depth == "basic":
+            return self.jobs.submit("basic_summary", f"{doc_id}|{version}", basic_summary_job,
+                                    self.embed_manager, self.summarizer, doc_id)
+        chunk_count = min(self.embed_manager.document_chunk_count(doc_id), DEPTH_CHUNKS[depth])
+        return self.jobs.submit("detailed_summary", f"{doc_id}|{depth}|{chunk_count}|{version}",
+                                detailed_summary_job, self.embed_manager, self.summarizer, doc_id,
+                                chunk_count, depth)
+
+    def _check_document(self, doc_id: str):
+        if not self.embed_manager.has_document(doc_id):
+            raise HTTPError(404, f"Unknown document {doc_id}; ingest it first")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Load the model in the background, so liveness probes pass meanwhile
+                asyncio.ensure_future(self.warm_up())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        path = scope["path"].rstrip("/") or "/"
+        method = scope["method"]
+        route = path if path in self._routes else "/jobs" if path.startswith("/jobs/") else "other"
+        with metrics.span("http_request", path=route):
+            try:
+                if path.startswith("/jobs/"):
+                    expected, handler = "GET", None
+                elif path in self._routes:
+                    expected, handler = self._routes[path]
+                else:
+                    raise HTTPError(404, f"Not found: {path}")
+                if method != expected:
+                    raise HTTPError(405, f"Use {expected} for {path}")
+                if handler is None:
+                    status, payload = await self.job(path[len("/jobs/"):])
+                else:
+                    headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                               for name, value in scope.get("headers", [])}
+                    request = {
+                        "body": await self._read_body(receive) if method == "POST" else b"",
+                        "content_type": headers.get("content-type", "").split(";")[0].strip().lower(),
+                        "query": {name: values[-1] for name, values in
+                                  parse_qs(scope.get("query_string", b"").decode('latin-1')).items()}
+                    }
+                    status, payload = await handler(request)
+            except HTTPError as e:
+                status, payload = e.status, {"error": str(e)}
+            except Exception as e:
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        metrics.inc("http_requests", path=route, status=status)
+
+        body = json.dumps(payload, default=_json_default).encode('utf-8')
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode('ascii'))]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _read_body(self, receive) -> bytes:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "Client disconnected")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise HTTPError(413, f"Request body over {self.max_body_bytes} bytes")
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+
+async def _blocking(func, *args, **kwargs):
+    """Run a blocking call (disk, SQLite, hashing) on the default executor, off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+def _json_body(request: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        body = json.loads(request["body"] or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return body
+
+
+def _search_result(item: Dict[str, Any]) -> Dict[str, Any]:
+    """A search result without its stored embedding."""
+    return {key: value for key, value in item.items() if key != 'embedding'}
+
+
+def _job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """The public state of a job: ingest results report their page count as "pages"."""
+    result = job["result"]
+    if result is not None and job["kind"] == "ingest":
+        result = {"chunk_count": result["chunk_count"], "pages": result["page_count"],
+                  "file_type": result["file_type"]}
+    return {"job_id": job["id"], "status": job["status"], "progress": job["progress"],
+            "message": job["message"], "error": job["error"], "result": result}
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def create_app(persist_directory: Optional[str] = "./chroma_db", jobs_path: Optional[str] = "./jobs/service.sqlite3",
+               job_workers: int = 2, max_batch_size: int = 64, max_wait: float = 0.005) -> SummarizationService:
+    """
+    Build the service with the app's chunking and summarization settings.
+
+    Opening the index does not load the embedding model; the service's warm-up
+    loads it after start-up, and /readyz reports ready once it has.
+    """
+    processor = DocumentProcessor(chunk_size=1000, chunk_overlap=200, structure_aware=True)
+    embed_manager = EmbeddingManager(persist_directory=persist_directory)
+    summarizer = Summarizer(cache=SummaryCache())
+    jobs = JobQueue(jobs_path, max_workers=job_workers)
+    return SummarizationService(processor, embed_manager, summarizer, jobs,
+                                max_batch_size=max_batch_size, max_wait=max_wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ingest, search and summarize over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--jobs-path", default="./jobs/service.sqlite3", help="SQLite file of the job queue")
+    parser.add_argument("--job-workers", type=int, default=2, help="Ingest and summarize jobs run concurrently")
+    parser.add_argument("--batch-size", type=int, default=64, help="Most searches answered with one encoder call")
+    parser.add_argument("--batch-wait-ms", type=float, default=5.0,
+                        help="How long a search waits for others to batch with")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve /metrics and /traces")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    app = create_app(persist_directory=args.persist_directory, jobs_path=args.jobs_path,
+                     job_workers=args.job_workers, max_batch_size=args.batch_size,
+                     max_wait=args.batch_wait_ms / 1000)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Section structure of documents: heading detection and segmentation into sections.
+
+Headings are detected line by line in a single pass, so segmenting a document
+costs one scan of its text. DocumentProcessor uses the segments for
+structure-aware chunking, and the section labels end up in chunk metadata.
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Common section headings in academic and technical documents
+SECTION_KEYWORDS = [
+    "abstract", "introduction", "background", "literature review",
+    "methodology", "methods", "experiment", "implementation",
+    "results", "findings", "discussion", "analysis",
+    "conclusion", "future work", "references"
+]
+
+# Sections shorter than this (after their heading line) are merged into the next one
+MIN_SECTION_CHARS = 200
+
+_NUMBERING = re.compile(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.|[A-Z]\.)\s+")
+# "Chapter 3", "Section 2.1: Data", "Part II", "Appendix" or "Appendix B. Proofs"; the group is the title
+_NAMED_HEADING = re.compile(r"^(?:(?i:chapter|section|part|appendix)\s+(?:\d+(?:\.\d+)*|[IVXLC]+|[A-Z])\.?"
+                            r"|(?i:appendix))(?:\s*[:.\-\u2013\u2014]?\s+(.*)|:?)$")
+# Words a heading title does not end with: a line ending in one is a sentence wrapped onto the next line
+_OPEN_ENDINGS = {
+    "a", "an", "the", "and", "or", "but", "nor", "of", "in", "on", "at", "to", "for", "with", "by",
+    "from", "as", "that", "which", "who", "whose", "their", "its", "our", "this", "these", "those",
+    "is", "are", "was", "were", "be", "we"
+}
+
+
+def is_heading(line: str) -> bool:
+    """
+    Whether a line looks like a section heading: short, not ending like a sentence,
+    and either all caps, numbered or starting with chapter/section followed by a
+    short title (see _is_title), or naming a common section.
+    """
+    line = line.strip()
+    if not 3 <= len(line) <= 100 or line[-1] in ".,;" or len(line.split()) > 12:
+        return False
+    if any(c.isalpha() for c in line) and line.isupper():
+        return True
+    named = _NAMED_HEADING.match(line)
+    if named:
+        return named.group(1) is None or _is_title(named.group(1))
+    numbering = _NUMBERING.match(line)
+    if numbering and _is_title(line[numbering.end():]):
+        return True
+    # A bare section name such as "Results" or "Related work and background:"
+    words = _NUMBERING.sub("", line).rstrip(":").lower().split()
+    return len(words) <= 4 and section_type(line) != ""
+
+
+def _is_title(text: str) -> bool:
+    """Whether the text after a heading's numbering reads like a title rather than wrapped body text."""
+    words = text.split()
+    return 0 < len(words) <= 8 and text[0].isupper() and words[-1].lower() not in _OPEN_ENDINGS
+
+
+def section_type(heading: str) -> str:
+    """The SECTION_KEYWORDS entry a heading names (the earliest one in it), or ''."""
+    lower = heading.lower()
+    positions = [(lower.find(keyword), keyword) for keyword in SECTION_KEYWORDS if keyword in lower]
+    return min(positions)[1] if positions else ""
+
+
+def iter_sections(pages: Iterable[str]) -> Iterator[Dict[str, object]]:
+    """
+    Split consecutive pages of text into sections at detected headings.
+
+    Yields dicts with the section's 'heading' ('' before the first heading), its
+    'section_type' (see section_type), its 'text' (starting with the heading
+    line), the 'page' it starts on (from 1), and 'char_start', its offset in the
+    concatenated pages. Sections with less than MIN_SECTION_CHARS of body are
+    merged into the following one, which keeps headings of title pages and
+    heading runs from becoming tiny chunks; the merged section takes the last
+    heading, and the type of the last heading that names one ("2. Methods"
+    followed by "2.1 Data" is a 'methods' section).
+    """
+    lines = []
+    heading = ""
+    kind = ""
+    page = 1
+    start = 0
+    body_chars = 0
+    offset = 0
+    for page_num, text in enumerate(pages, start=1):
+        for line in text.splitlines(keepends=True):
+            if is_heading(line):
+                if lines and body_chars >= MIN_SECTION_CHARS:
+                    yield {"heading": heading, "section_type": kind, "text": "".join(lines),
+                           "page": page, "char_start": start}
+                    lines = []
+                if not lines:
+                    page, start = page_num, offset
+                    kind = ""
+                heading = line.strip()
+                kind = section_type(heading) or kind
+                body_chars = 0
+            else:
+                body_chars += len(line.strip())
+            lines.append(line)
+            offset += len(line)
+    if lines:
+        yield {"heading": heading, "section_type": kind, "text": "".join(lines), "page": page, "char_start": start}
+
+
+def find_sections(text: str, max_sections: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    List the headings of a text with a short preview of the lines following each.
+
+    For documents indexed before chunks carried section metadata.
+    """
+    lines = text.split('\n')
+    sections = []
+    for i, line in enumerate(lines):
+        if not is_heading(line):
+            continue
+        sections.append({"heading": line.strip(), "preview": section_preview(lines[i + 1:i + 6])})
+        if max_sections is not None and len(sections) >= max_sections:
+            break
+    return sections
+
+
+def section_preview(lines: List[str]) -> str:
+    """A preview of a section from the lines after its heading, skipping empty and very short ones."""
+    preview_lines = [line.strip() for line in lines if len(line.strip()) > 10]
+    return " ".join(preview_lines)[:200] + "..." if preview_lines else ""
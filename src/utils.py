@@ -1,15 +1,5 @@
-import tiktoken
-import time
+from src.resources import get_tokenizer
 
 def count_tokens(text: str, model: str = "cl100k_base") -> int:
-    tokenizer = tiktoken.get_encoding(model)
+    tokenizer = get_tokenizer(model)
     return len(tokenizer.encode(text))
-
-def timeit(func):
-    def wrapper(*args, **kwargs):
-        start = time.time()
-        result = func(*args, **kwargs)
-        end = time.time()
-        print(f"Function {func.__name__} took {end - start:.2f} seconds.")
-        return result
-    return wrapper 
\ No newline at end of file
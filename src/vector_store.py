@@ -0,0 +1,267 @@
+import json
+import os
+import threading
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+
+class VectorStore:
+    """
+    Interface of the vector indexes behind EmbeddingManager.
+
+    query() returns Chroma-shaped results: a dict of 'ids', 'documents',
+    'metadatas' and 'distances', each holding one list per query embedding.
+    Distances are cosine distances (1 - cosine similarity). With
+    include_embeddings it also returns the stored vectors under 'embeddings'.
+
+    query() and get() take an optional Chroma-style metadata filter, e.g.
+    {"section_type": "results"} or {"section_type": {"$in": ["results", "discussion"]}}.
+    """
+
+    # Short name of the backend, used in the index manifest and in metrics labels
+    backend = ""
+
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str],
+            metadatas: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def query(self, query_embeddings: np.ndarray, n_results: int, include_embeddings: bool = False,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, include_embeddings: bool = False,
+            where: Optional[Dict[str, Any]] = None) -> Dict[str, List[Any]]:
+        """
+        Get stored entries by id and/or metadata filter (all of them if neither is given)
+        as flat 'ids', 'documents', 'metadatas' lists.
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def drop(self):
+        """Delete the store and everything in it."""
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """A Chroma collection using an HNSW index in cosine space."""
+
+    backend = "chroma"
+
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+        self.collection = client.get_or_create_collection(
+            name=name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.add(
+            ids=ids,
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def query(self, query_embeddings, n_results, include_embeddings=False, where=None):
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        return self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where or None,
+            include=include
+        )
+
+    def get(self, ids=None, include_embeddings=False, where=None):
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+        found = self.collection.get(ids=ids, where=where or None, include=include)
+        if ids is None:
+            order = range(len(found["ids"]))
+        else:
+            # Chroma does not promise to keep the order of the requested ids
+            rows = {chunk_id: row for row, chunk_id in enumerate(found["ids"])}
+            order = [rows[chunk_id] for chunk_id in ids if chunk_id in rows]
+        return {key: [values[row] for row in order] for key, values in found.items()
+                if key in ("ids", "documents", "metadatas", "embeddings") and values is not None}
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def drop(self):
+        try:
+            self.client.delete_collection(self.name)
+        except Exception:
+            # Already gone, e.g. removed by another manager sharing the client
+            pass
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine search over a contiguous float32 matrix.
+
+    Meant for small indexes such as a single uploaded document, where one matmul
+    plus argpartition beats building and querying an HNSW graph.
+
+    add(), drop(), get() and save() hold the store's lock; query() holds it only
+    to take the rows stored so far, and searches them after releasing it. That is
+    safe because add() only writes rows past the stored count (or into a grown
+    copy) and drop() replaces the arrays instead of clearing them.
+    """
+
+    backend = "exact"
+
+    def __init__(self, dimension: int, initial_capacity: int = 256):
+        self.dimension = dimension
+        self._matrix = np.empty((initial_capacity, dimension), dtype=np.float32)
+        self._size = 0
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def add(self, ids, embeddings, documents, metadatas):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        # Rows are stored L2-normalized so a dot product is the cosine similarity
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+        with self._lock:
+            needed = self._size + len(ids)
+            if needed > len(self._matrix):
+                grown = np.empty((max(needed, 2 * len(self._matrix)), self.dimension), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+            self._matrix[self._size:needed] = embeddings
+            self._rows.update((chunk_id, row) for row, chunk_id in enumerate(ids, start=self._size))
+            self.ids.extend(ids)
+            self.documents.extend(documents)
+            self.metadatas.extend(metadatas)
+            self._size = needed
+
+    def query(self, query_embeddings, n_results, include_embeddings=False, where=None):
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            size, stored, ids, documents, metadatas = (self._size, self._matrix, self.ids, self.documents,
+                                                       self.metadatas)
+        # Candidate rows: the ones matching the filter, or all of them
+        rows = np.arange(size) if not where else np.array(_filter(metadatas, size, where), dtype=np.int64)
+        n_results = min(n_results, len(rows))
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if include_embeddings:
+            results["embeddings"] = []
+        if n_results <= 0:
+            for values in results.values():
+                values.extend([] for _ in queries)
+            return results
+
+        matrix = stored[:size] if not where else stored[rows]
+        similarities = queries @ matrix.T
+        if n_results < len(rows):
+            top = np.argpartition(-similarities, n_results - 1, axis=1)[:, :n_results]
+        else:
+            top = np.tile(np.arange(len(rows)), (len(queries), 1))
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-similarities[row, candidates], kind="stable")]
+            distances = (1.0 - similarities[row, ranked]).tolist()
+            order = rows[ranked]
+            results["ids"].append([ids[i] for i in order])
+            results["documents"].append([documents[i] for i in order])
+            results["metadatas"].append([metadatas[i] for i in order])
+            results["distances"].append(distances)
+            if include_embeddings:
+                results["embeddings"].append(stored[order])
+        return results
+
+    def get(self, ids=None, include_embeddings=False, where=None):
+        with self._lock:
+            rows = range(self._size) if ids is None else [self._rows[chunk_id] for chunk_id in ids
+                                                          if chunk_id in self._rows]
+            if where:
+                matching = set(_filter(self.metadatas, self._size, where))
+                rows = [row for row in rows if row in matching]
+            found = {
+                "ids": [self.ids[row] for row in rows],
+                "documents": [self.documents[row] for row in rows],
+                "metadatas": [self.metadatas[row] for row in rows]
+            }
+            if include_embeddings:
+                found["embeddings"] = self._matrix[list(rows)]
+            return found
+
+    def count(self) -> int:
+        return self._size
+
+    def drop(self):
+        with self._lock:
+            self._matrix = np.empty((0, self.dimension), dtype=np.float32)
+            self._size = 0
+            self.ids, self.documents, self.metadatas = [], [], []
+            self._rows = {}
+
+    def save(self, path: str):
+        """Write the store to an .npz file, replacing any previous snapshot atomically."""
+        tmp_path = path + ".tmp.npz"
+        with self._lock:
+            np.savez(
+                tmp_path,
+                matrix=self._matrix[:self._size],
+                ids=np.array(self.ids, dtype=str),
+                documents=np.array(self.documents, dtype=str),
+                metadatas=np.array([json.dumps(metadata) for metadata in self.metadatas], dtype=str)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyVectorStore":
+        """Load a store written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            matrix = data["matrix"]
+            store = cls(matrix.shape[1], initial_capacity=max(len(matrix), 1))
+            store._matrix[:len(matrix)] = matrix
+            store._size = len(matrix)
+            store.ids = data["ids"].tolist()
+            store._rows = {chunk_id: row for row, chunk_id in enumerate(store.ids)}
+            store.documents = data["documents"].tolist()
+            store.metadatas = [json.loads(metadata) for metadata in data["metadatas"].tolist()]
+        return store
+
+
+def _filter(metadatas: List[Dict[str, Any]], size: int, where: Dict[str, Any]) -> List[int]:
+    """Rows among the first size whose metadata matches a Chroma-style filter ($and, $or, $eq, $ne, $in, $nin)."""
+    return [row for row in range(size) if _matches(metadatas[row], where)]
+
+
+def _matches(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evaluate a Chroma-style metadata filter against one entry's metadata."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$nin" and value in operand:
+                return False
+            if operator not in ("$eq", "$ne", "$in", "$nin"):
+                raise ValueError(f"Unsupported filter operator '{operator}'")
+    return True
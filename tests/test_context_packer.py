@@ -0,0 +1,27 @@
+import numpy as np
+from src.context_packer import pack_context
+
+QUERY = np.array([1.0, 0.0, 0.0])
+
+
+def item(index, embedding, distance=None):
+    return {"id": f"doc_{index}", "text": f"chunk {index}", "distance": distance,
+            "embedding": np.array(embedding),
+            "metadata": {"doc_id": "doc", "index": index, "token_count": 100}}
+
+
+def test_mixed_results_are_ranked_against_the_query_when_cut_by_the_budget():
+    dense = [item(0, [0.6, 0.8, 0.0], distance=0.4), item(1, [0.5, 0.0, 0.75 ** 0.5], distance=0.5)]
+    # A section chunk has no distance and comes last, but is the closest match to the query
+    section = item(2, [1.0, 0.0, 0.0])
+
+    packed = pack_context(dense + [section], token_budget=200, query_embedding=QUERY)
+    assert [chunk["id"] for chunk in packed] == ["doc_0", "doc_2"]
+
+
+def test_without_a_query_embedding_results_without_distance_keep_their_rank():
+    dense = [item(0, [0.6, 0.8, 0.0], distance=0.4), item(1, [0.5, 0.0, 0.75 ** 0.5], distance=0.5)]
+    section = item(2, [1.0, 0.0, 0.0])
+
+    packed = pack_context(dense + [section], token_budget=200)
+    assert [chunk["id"] for chunk in packed] == ["doc_0", "doc_1"]
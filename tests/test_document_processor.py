@@ -0,0 +1,49 @@
+import io
+import json
+import pytest
+from src import document_processor
+from src.document_processor import DocumentProcessor, _iter_json_array
+
+
+@pytest.fixture
+def tiny_reads(monkeypatch):
+    """Read JSON arrays a few characters at a time, so values straddle reads."""
+    monkeypatch.setattr(document_processor, "JSON_READ_SIZE", 3)
+
+
+@pytest.mark.parametrize("data", [
+    [1, 22, 333, 4444, 55555],
+    [-1.5, 2e10, True, False, None],
+    ["a", "bcdef", "", "with \"quotes\" and ]"],
+    [{"id": 1, "abstract": "x" * 50}, {"id": 22, "nested": [1, [2, 3]]}],
+    [],
+])
+def test_iter_json_array_with_tiny_reads(tiny_reads, data):
+    assert list(_iter_json_array(io.StringIO(json.dumps(data)))) == data
+
+
+def test_iter_json_array_skips_long_leading_whitespace(tiny_reads):
+    assert list(_iter_json_array(io.StringIO(" \n\t " * 10 + "[7, 88]"))) == [7, 88]
+
+
+def test_iter_json_array_rejects_unterminated_array(tiny_reads):
+    with pytest.raises(ValueError):
+        list(_iter_json_array(io.StringIO("[1, 2")))
+
+
+def test_iter_json_records_reads_arrays_and_json_lines(tiny_reads, tmp_path):
+    records = [{"id": i, "title": f"paper {i}"} for i in range(20)]
+    array_path = tmp_path / "records.json"
+    array_path.write_text("\n\n" + json.dumps(records), encoding='utf-8')
+    lines_path = tmp_path / "records.jsonl"
+    lines_path.write_text("\n".join(json.dumps(record) for record in records), encoding='utf-8')
+
+    processor = DocumentProcessor()
+    assert list(processor.iter_json_records(str(array_path))) == records
+    assert list(processor.iter_json_records(str(lines_path))) == records
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(100, 100), (100, 150), (100, -1), (0, 0)])
+def test_rejects_overlap_not_smaller_than_chunk_size(chunk_size, chunk_overlap):
+    with pytest.raises(ValueError):
+        DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
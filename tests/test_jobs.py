@@ -0,0 +1,20 @@
+from src.jobs import DONE, FAILED, JobQueue
+
+
+def test_unserializable_result_fails_the_job(tmp_path):
+    jobs = JobQueue(path=str(tmp_path / "jobs.sqlite3"))
+    job_id = jobs.submit("test", "unserializable", lambda progress: {"value": object()})
+    job = jobs.wait(job_id, timeout=10)
+    assert job["status"] == FAILED
+    assert "JSON-serializable" in job["error"]
+    assert job["result"] is None
+    assert jobs.get(job_id)["status"] == FAILED
+
+
+def test_result_is_stored(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    jobs = JobQueue(path=path)
+    job_id = jobs.submit("test", "ok", lambda progress: {"value": 1})
+    assert jobs.wait(job_id, timeout=10)["status"] == DONE
+    # Another process sees the stored result
+    assert JobQueue(path=path).get(job_id)["result"] == {"value": 1}
@@ -0,0 +1,75 @@
+import pytest
+from src.llm_client import GeminiClient, LLMError
+from src.metrics import metrics
+from src.mock_llm_server import start_mock_server
+from src.rag_pipeline import Summarizer
+
+PROMPT = "Summarize this document.\n\nRetrieval augmented generation grounds answers in documents."
+
+
+@pytest.fixture
+def server():
+    server = start_mock_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, **kwargs) -> GeminiClient:
+    # No rate limit and no backoff delay, so retries happen at once
+    kwargs = {"requests_per_minute": 0, "backoff": 0.0, **kwargs}
+    return GeminiClient(api_key="test-key", base_url=server.base_url, **kwargs)
+
+
+def test_generate_returns_the_response_text(server):
+    client = make_client(server)
+    assert client.generate(PROMPT) == server.respond(PROMPT)
+    assert server.requests == 1
+
+
+@pytest.mark.parametrize("statuses", [[429], [503], [429, 500, 502]])
+def test_generate_retries_rate_limits_and_server_errors(server, statuses):
+    server.fail_first = list(statuses)
+    retries = metrics.counter("llm_retries")
+    client = make_client(server, max_retries=3)
+    assert client.generate(PROMPT) == server.respond(PROMPT)
+    assert server.requests == len(statuses) + 1
+    assert metrics.counter("llm_retries") - retries == len(statuses)
+
+
+def test_generate_gives_up_after_max_retries(server):
+    server.fail_first = [503, 503, 503]
+    client = make_client(server, max_retries=2)
+    with pytest.raises(LLMError, match="503"):
+        client.generate(PROMPT)
+    assert server.requests == 3
+
+
+def test_client_errors_are_not_retried(server):
+    server.fail_first = [400]
+    client = make_client(server, max_retries=3)
+    with pytest.raises(LLMError, match="400"):
+        client.generate(PROMPT)
+    assert server.requests == 1
+
+
+def test_stream_yields_the_response_in_pieces(server):
+    server.fail_first = [429]
+    client = make_client(server)
+    pieces = list(client.stream(PROMPT))
+    assert len(pieces) > 1
+    assert "".join(pieces) == server.respond(PROMPT)
+
+
+def test_summarizer_uses_the_client(server):
+    summarizer = Summarizer(llm_client=make_client(server))
+    summary = summarizer.generate_summary(["Retrieval augmented generation grounds answers in documents."])
+    assert summary.startswith("Mock summary of")
+
+
+def test_summarizer_heuristic_backend_overrides_environment(monkeypatch):
+    monkeypatch.setenv("SUMMARIZER_BACKEND", "gemini")
+    assert isinstance(Summarizer().llm_client, GeminiClient)
+    summarizer = Summarizer(backend="heuristic")
+    assert summarizer.llm_client is None
+    assert "/heuristic/" in summarizer.version
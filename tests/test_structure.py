@@ -0,0 +1,43 @@
+import pytest
+from src.structure import is_heading, iter_sections
+
+
+@pytest.mark.parametrize("line", [
+    "1 Introduction",
+    "2.1 Data Collection",
+    "3. Experimental Setup",
+    "IV. Results and Discussion",
+    "A. Proof of Theorem 1",
+    "Chapter 3",
+    "Section 2: Related Work",
+    "Part II",
+    "Appendix",
+    "Appendix B. Additional Experiments",
+    "RELATED WORK",
+    "Results",
+])
+def test_headings(line):
+    assert is_heading(line)
+
+
+@pytest.mark.parametrize("line", [
+    # Body text wrapped by PDF extraction, starting with a number, a letter or a section reference
+    "2 results in a large improvement over the baseline, which",
+    "Section 3 describes the method we used to collect the",
+    "A. Smith et al. proposed a related approach in their",
+    "12 participants completed the study and",
+    "Chapter 4 extends the analysis of Section 3 to larger models",
+    "1.5 times faster than the previous implementation of",
+    "3 Data collection procedure for all of the",
+    "We describe the results in Section 4.",
+])
+def test_wrapped_body_lines_are_not_headings(line):
+    assert not is_heading(line)
+
+
+def test_wrapped_lines_do_not_split_sections():
+    body = "The new index answers queries faster than the old one. " * 5
+    text = (f"1 Introduction\n{body}\nacross the benchmarks we ran, the speed-up in Table\n"
+            f"2 results in a large improvement over the baseline, which\nis consistent with the model.\n{body}\n"
+            f"2 Methods\n{body}\n")
+    assert [section["heading"] for section in iter_sections([text])] == ["1 Introduction", "2 Methods"]
@@ -0,0 +1,49 @@
+import threading
+import numpy as np
+from src.vector_store import NumpyVectorStore
+
+
+def add_chunks(store, rng, count):
+    start = store.count()
+    ids = [f"chunk_{i}" for i in range(start, start + count)]
+    store.add(ids, rng.standard_normal((count, 8)), [f"text {i}" for i in ids],
+              [{"index": i} for i in range(start, start + count)])
+
+
+def test_query_sees_consistent_rows_while_adding_and_dropping():
+    store = NumpyVectorStore(8, initial_capacity=1)
+    rng = np.random.default_rng(0)
+    errors = []
+    stop = threading.Event()
+
+    def search():
+        query = np.ones((1, 8))
+        try:
+            while not stop.is_set():
+                results = store.query(query, 5, include_embeddings=True, where={"index": {"$ne": -1}})
+                assert len(results["ids"][0]) == len(results["documents"][0]) == len(results["embeddings"][0])
+                for chunk_id, document in zip(results["ids"][0], results["documents"][0]):
+                    assert document == f"text {chunk_id}"
+        except Exception as e:
+            errors.append(e)
+
+    searchers = [threading.Thread(target=search) for _ in range(4)]
+    for thread in searchers:
+        thread.start()
+    for _ in range(200):
+        add_chunks(store, rng, 7)
+        if store.count() > 50:
+            store.drop()
+    stop.set()
+    for thread in searchers:
+        thread.join()
+    assert not errors
+
+
+def test_drop_empties_the_store():
+    store = NumpyVectorStore(8)
+    add_chunks(store, np.random.default_rng(0), 3)
+    store.drop()
+    assert store.count() == 0
+    assert store.get()["ids"] == []
+    assert store.query(np.ones((1, 8)), 5)["ids"] == [[]]